@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Benchmark packed LLM evaluation requests against single-applicant requests.
+
+Evaluates generated applicants (sample_data.generate_applicants) at each pack
+size and reports requests, tokens, wall time and fallbacks. Nothing is written
+to Airtable. Point OPENAI_BASE_URL at a local OpenAI-compatible fake server to
+measure request overhead without spending tokens:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python benchmark_llm.py --count 100 --pack-sizes 1 5 10
+"""
+import argparse
+import json
+import time
+from llm_client import EvaluationError, llm_usage
+from llm_evaluation import evaluate_applicants_with_llm
+from sample_data import generate_applicants
+
+
+def applicant_fields(applicant):
+    """Applicants-table fields for a generated applicant, as compress would write them."""
+    compressed = {name: applicant[name] for name in ("personal", "experience", "salary")}
+    return {"Applicant ID": applicant["id"], "Compressed JSON": json.dumps(compressed, indent=2)}
+
+
+def run_benchmark(applicants, pack_size):
+    """Evaluate `applicants` `pack_size` per request; return the run's measurements."""
+    before = dict(llm_usage)
+    started = time.perf_counter()
+
+    failed = 0
+    for start in range(0, len(applicants), pack_size):
+        results = evaluate_applicants_with_llm(applicants[start:start + pack_size])
+        failed += sum(isinstance(result, EvaluationError) for result in results)
+
+    seconds = time.perf_counter() - started
+    used = {name: llm_usage[name] - before.get(name, 0)
+            for name in ("requests", "prompt_tokens", "completion_tokens")}
+    packs = -(-len(applicants) // pack_size)
+    return {
+        "pack_size": pack_size,
+        "seconds": seconds,
+        "failed": failed,
+        # Requests beyond one per pack are fallbacks or retries
+        "extra_requests": used["requests"] - packs,
+        **used,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark packed LLM evaluation requests.")
+    parser.add_argument("--count", type=int, default=50, help="Applicants to evaluate per pack size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pack-sizes", type=int, nargs="+", default=[1, 5, 10])
+    args = parser.parse_args()
+
+    applicants = [applicant_fields(applicant) for applicant in generate_applicants(args.count, args.seed)]
+
+    print(f"{'pack':>5} {'requests':>9} {'extra':>6} {'prompt tok':>11} {'output tok':>11} "
+          f"{'seconds':>8} {'per applicant':>14} {'failed':>7}")
+    for pack_size in args.pack_sizes:
+        result = run_benchmark(applicants, pack_size)
+        print(f"{pack_size:>5} {result['requests']:>9} {result['extra_requests']:>6} "
+              f"{result['prompt_tokens']:>11} {result['completion_tokens']:>11} "
+              f"{result['seconds']:>8.2f} {result['seconds'] / len(applicants) * 1000:>11.1f} ms "
+              f"{result['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
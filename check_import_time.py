@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Regression check for CLI cold-start cost of the non-LLM steps.
+
+Runs a fresh interpreter with `-X importtime` for each step, the same way
+`python run_automation.py <step>` would import it, and fails if the step
+pulls in the LLM SDKs or its total import time exceeds the budget.
+
+    python check_import_time.py                # default budget
+    python check_import_time.py --budget-ms 600
+"""
+import argparse
+import subprocess
+import sys
+
+# Steps that must start without the LLM SDKs
+NON_LLM_STEPS = ["compress", "decompress", "shortlist"]
+FORBIDDEN_MODULES = ["openai", "langsmith"]
+DEFAULT_BUDGET_MS = 750
+RUNS_PER_STEP = 3  # Best of N to smooth out noisy machines
+
+
+def measure_step(step):
+    """Import a step in a fresh interpreter; return (total ms, imported modules)."""
+    code = f"import run_automation; run_automation.load_step({step!r})"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):  # Top-level import, cumulative covers children
+            total_us += int(cumulative)
+
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time of non-LLM steps.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum import time per step (default {DEFAULT_BUDGET_MS} ms)")
+    args = parser.parse_args()
+
+    failures = []
+    for step in NON_LLM_STEPS:
+        timings = []
+        for _ in range(RUNS_PER_STEP):
+            total_ms, modules = measure_step(step)
+            timings.append(total_ms)
+        best_ms = min(timings)
+
+        leaked = sorted(
+            name for name in modules
+            if name.split(".")[0] in FORBIDDEN_MODULES
+        )
+        status = "OK"
+        if leaked:
+            status = "FAIL"
+            failures.append(f"{step}: imports {', '.join(leaked[:5])}")
+        if best_ms > args.budget_ms:
+            status = "FAIL"
+            failures.append(f"{step}: {best_ms:.0f} ms > {args.budget_ms:.0f} ms budget")
+        print(f"{step:<12} {best_ms:8.1f} ms  {status}")
+
+    if failures:
+        print("\nImport time check failed:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+    print("\nImport time check passed.")
+
+
+if __name__ == "__main__":
+    main()
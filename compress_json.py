@@ -1,16 +1,23 @@
 """Script to compress applicant data from multiple tables into a single JSON object."""
 import json
 from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
 from config import (
-    AIRTABLE_API_KEY, AIRTABLE_BASE_ID,
     APPLICANTS_TABLE, PERSONAL_DETAILS_TABLE,
     WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE
 )
+from sharding import SHARD_KEY_FIELD, select_shard, shard_formula, shard_key
+from shortlist_leads import DERIVED_FIELDS, derived_fields
+from write_buffer import applicant_writes
+
+# Applicants fields this stage reads (fetched values let unchanged ones be skipped)
+APPLICANT_FIELDS = ["Applicant ID", "Compressed JSON"] + DERIVED_FIELDS + [SHARD_KEY_FIELD]
 
 
 def get_table(table_name):
     """Get Airtable table instance."""
-    return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
 
 
 def get_linked_records(table, applicant_id_field, applicant_id):
@@ -73,27 +80,50 @@ def compress_applicant_data(applicant_id):
     return json.dumps(compressed_json, indent=2)
 
 
+def compressed_fields(compressed_json, applicant_id=None):
+    """Applicants fields to write for new Compressed JSON: the JSON and the fields derived from it.
+
+    With `applicant_id`, the applicant's Shard Key is included too.
+    """
+    fields = {"Compressed JSON": compressed_json, **derived_fields(json.loads(compressed_json))}
+    if applicant_id is not None:
+        fields[SHARD_KEY_FIELD] = shard_key(applicant_id)
+    return fields
+
+
 def update_applicant_compressed_json(applicant_record_id, compressed_json):
-    """Update the Compressed JSON field in the Applicants table."""
+    """Update the Compressed JSON field, and the fields derived from it, in the Applicants table."""
     applicants_table = get_table(APPLICANTS_TABLE)
-    applicants_table.update(applicant_record_id, {"Compressed JSON": compressed_json})
+    applicants_table.update(applicant_record_id, compressed_fields(compressed_json))
     print(f"Updated compressed JSON for applicant record {applicant_record_id}")
 
 
-def compress_all_applicants():
-    """Compress data for all applicants."""
+def compress_all_applicants(write_buffer=None, shard=None):
+    """Compress data for all applicants, or only those in `shard` (index, count).
+
+    Updates are staged in `write_buffer` when one is given (so later stages can
+    coalesce their writes with ours); otherwise they are written at the end.
+    """
     applicants_table = get_table(APPLICANTS_TABLE)
-    applicants = applicants_table.all()
     
-    for applicant in applicants:
-        applicant_id = applicant['fields'].get('Applicant ID')
-        if not applicant_id:
-            print(f"Skipping applicant without ID: {applicant['id']}")
-            continue
-            
-        print(f"Compressing data for applicant: {applicant_id}")
-        compressed_json = compress_applicant_data(applicant_id)
-        update_applicant_compressed_json(applicant['id'], compressed_json)
+    compressed_count = 0
+    with applicant_writes(write_buffer) as writes:
+        records = applicants_table.all(fields=APPLICANT_FIELDS, formula=shard_formula(shard))
+        applicants = select_shard(writes.track(records, APPLICANT_FIELDS), shard)
+        
+        for applicant in applicants:
+            applicant_id = applicant['fields'].get('Applicant ID')
+            if not applicant_id:
+                print(f"Skipping applicant without ID: {applicant['id']}")
+                continue
+                
+            print(f"Compressing data for applicant: {applicant_id}")
+            compressed_json = compress_applicant_data(applicant_id)
+            writes.stage(applicant['id'], compressed_fields(compressed_json, applicant_id))
+            applicant['fields']['Compressed JSON'] = compressed_json
+            compressed_count += 1
+    
+    return compressed_count
 
 
 if __name__ == "__main__":
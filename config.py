@@ -1,12 +1,21 @@
-"""Configuration for Airtable automation system."""
-import os
-from dotenv import load_dotenv
+"""Configuration for Airtable automation system.
 
-load_dotenv()
+Importing this module has no side effects. Settings that come from the
+environment (and the .env file) are loaded on first access through
+`load_settings()`, which caches the result for the life of the process.
+"""
+import os
+from functools import lru_cache
 
-# Airtable configuration
-AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
-AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
+# Environment-backed settings and their defaults
+ENV_SETTINGS = {
+    "AIRTABLE_API_KEY": None,
+    "AIRTABLE_BASE_ID": None,
+    "OPENAI_API_KEY": None,
+    "OPENAI_BASE_URL": None,  # e.g. a local OpenAI-compatible server for benchmarks
+    "LANGSMITH_API_KEY": None,
+    "LANGSMITH_PROJECT": "airtable-automation",
+}
 
 # Table names
 APPLICANTS_TABLE = "Applicants"
@@ -15,15 +24,72 @@ WORK_EXPERIENCE_TABLE = "Work Experience"
 SALARY_PREFERENCES_TABLE = "Salary Preferences"
 SHORTLISTED_LEADS_TABLE = "Shortlisted Leads"
 
-# LLM configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY")
-LANGSMITH_PROJECT = os.getenv("LANGSMITH_PROJECT", "airtable-automation")
+# Airtable API limits (5 requests/sec per base, 10 records per batch request)
+AIRTABLE_REQUESTS_PER_SECOND = 5
+AIRTABLE_BATCH_SIZE = 10
 
 # Shortlisting criteria
 TIER_1_COMPANIES = ["Google", "Meta", "OpenAI", "Microsoft", "Amazon", "Apple", "Netflix"]
+# Matched against the country found in each location (see countries.py for the names and aliases)
 ELIGIBLE_COUNTRIES = ["US", "USA", "United States", "Canada", "UK", "United Kingdom", "Germany", "India"]
 MIN_EXPERIENCE_YEARS = 4
 MAX_HOURLY_RATE = 100
 MIN_AVAILABILITY_HOURS = 20
 
+# LLM evaluation scheduling
+# Scope: "all", "near_miss" (shortlisted or one criterion short) or "shortlisted"
+LLM_EVALUATION_SCOPE = "near_miss"
+# Stop after this many LLM calls per run (split evenly across shards); None for no limit
+LLM_MAX_EVALUATIONS_PER_RUN = None
+# Reuse the evaluation of a profile at least this similar (Jaccard over normalized
+# experience, salary and location; salary and location must match exactly);
+# None always calls the LLM
+LLM_DUPLICATE_THRESHOLD = 0.9
+# A standalone evaluate run writes its results every this many records; None writes them at the end
+LLM_FLUSH_EVERY_RECORDS = 50
+
+# LLM calls (structured outputs need gpt-4o or later)
+LLM_MODEL = "gpt-4o"
+LLM_TIMEOUT_SECONDS = 60
+LLM_PACK_SIZE = 5  # Applicants evaluated per LLM request; 1 sends each on its own
+LLM_MAX_ATTEMPTS = 4  # Tries per call for transient errors (rate limits, timeouts, 5xx)
+LLM_BACKOFF_SECONDS = 1  # First retry waits up to this long, doubling per retry
+LLM_BACKOFF_MAX_SECONDS = 30
+LLM_CIRCUIT_FAILURES = 5  # Consecutive transient failures that pause all LLM calls
+LLM_CIRCUIT_COOLDOWN_SECONDS = 60
+LLM_CIRCUIT_MAX_PAUSES = 3  # After this many pauses in a row, fail fast (one probe per cool-down)
+
+# Sharded execution (python run_automation.py shards | worker | shard-status)
+SHARD_COUNT = 8
+SHARD_WORKERS = 4  # Local worker processes started by `shards`
+SHARD_LEASE_DB = "shard_leases.sqlite3"  # Put on a shared filesystem for multi-host runs
+SHARD_LEASE_SECONDS = 60  # A shard is reclaimed if its worker misses heartbeats this long
+SHARD_MAX_ATTEMPTS = 3
+
+# Offline snapshots (python run_automation.py export | replay)
+SNAPSHOT_PATH = "applicants_snapshot.ndjson.gz"
+REPLAY_OUTPUT_PATH = "replay_results.ndjson"
+
+# Watch service (python run_automation.py watch)
+WATCH_HOST = "127.0.0.1"
+WATCH_PORT = 8787
+WATCH_POLL_INTERVAL_SECONDS = 15  # Set to None to rely on webhooks only
+WATCH_DEBOUNCE_SECONDS = 2  # Wait this long after an applicant's last edit
+WATCH_EVALUATION_RETRIES = 5  # Retries of a failed LLM evaluation (evaluation only)
+WATCH_RETRY_BACKOFF_SECONDS = 30  # First retry delay, doubling per retry
+
+
+@lru_cache(maxsize=None)
+def load_settings():
+    """Load the .env file once and return the environment-backed settings."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return {name: os.getenv(name, default) for name, default in ENV_SETTINGS.items()}
+
+
+def __getattr__(name):
+    """Resolve environment-backed settings such as AIRTABLE_API_KEY lazily."""
+    if name in ENV_SETTINGS:
+        return load_settings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,218 @@
+"""What-if sweeps of shortlisting criteria over parsed applicant profiles.
+
+Evaluates many criteria sets (MIN_EXPERIENCE_YEARS, MAX_HOURLY_RATE,
+MIN_AVAILABILITY_HOURS, TIER_1_COMPANIES, ELIGIBLE_COUNTRIES) in one pass
+without touching Airtable. Each profile's features are computed once. Each
+criterion's result is kept as a bitmask over all profiles and cached per
+distinct threshold or list, so one more configuration costs a few big-integer
+ANDs rather than another pass over the applicants.
+
+The rules match shortlist_leads.check_criteria:
+experience (years >= minimum, or any Tier-1 company), compensation
+(rate <= maximum and availability >= minimum) and location (the location's
+normalized country is an eligible one).
+
+    python criteria_sweep.py grid.json --snapshot applicants_snapshot.ndjson.gz
+"""
+import argparse
+import itertools
+import json
+import config
+from shortlist_leads import calculate_total_experience, eligible_countries, normalize_country
+
+CRITERIA_NAMES = [
+    "MIN_EXPERIENCE_YEARS", "MAX_HOURLY_RATE", "MIN_AVAILABILITY_HOURS",
+    "TIER_1_COMPANIES", "ELIGIBLE_COUNTRIES",
+]
+
+
+def current_criteria():
+    """The criteria currently configured in config.py."""
+    return {name: getattr(config, name) for name in CRITERIA_NAMES}
+
+
+def expand_grid(grid):
+    """Turn {criterion: [values, ...]} into one criteria dict per combination.
+
+    A list of criteria dicts is returned unchanged. Criteria missing from a
+    configuration fall back to the values in config.py.
+    """
+    if isinstance(grid, list):
+        return grid
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _mask(flags):
+    """Pack an iterable of booleans into an int with bit i set for profile i."""
+    bits = bytearray(49 if flag else 48 for flag in flags)  # ASCII "1" / "0"
+    bits.reverse()
+    return int(bits, 2) if bits else 0
+
+
+def _matcher(needles):
+    """Case-insensitive "any needle occurs in value" test, memoized per distinct value."""
+    needles = [needle.lower() for needle in needles]
+    matches = {}
+
+    def matched(value):
+        if value not in matches:
+            matches[value] = bool(value) and any(needle in value for needle in needles)
+        return matches[value]
+
+    return matched
+
+
+class ProfileSet:
+    """Parsed applicant profiles with per-criterion bitmask caches."""
+
+    def __init__(self, applicants):
+        self.applicant_ids = []
+        self.years = []
+        self.companies = []  # Lowercased company names per profile
+        self.rates = []
+        self.availability = []
+        self.countries = []  # Normalized country per profile
+        valid = []
+
+        for applicant in applicants:
+            fields = applicant['fields']
+            self.applicant_ids.append(fields.get('Applicant ID', applicant.get('id')))
+            try:
+                data = json.loads(fields.get("Compressed JSON", "{}"))
+            except json.JSONDecodeError:
+                data = None
+            valid.append(data is not None)
+            data = data or {}
+
+            experience = data.get("experience", [])
+            salary = data.get("salary", {})
+            self.years.append(calculate_total_experience(experience))
+            self.companies.append(tuple(
+                exp.get("company", "").strip().lower() for exp in experience
+            ))
+            self.rates.append(salary.get("rate", float('inf')))
+            self.availability.append(salary.get("availability", 0))
+            self.countries.append(normalize_country(data.get("personal", {}).get("location", "")))
+
+        # Invalid JSON is never shortlisted, like shortlist_leads.evaluate_candidate
+        self.valid_mask = _mask(valid)
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.applicant_ids)
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def _tier1_mask(self, tier1):
+        matched = _matcher(tier1)
+        return _mask(any(matched(company) for company in companies) for companies in self.companies)
+
+    def _location_mask(self, countries):
+        eligible = eligible_countries(countries)
+        return _mask(country in eligible for country in self.countries)
+
+    def shortlist_mask(self, criteria):
+        """Bitmask of profiles shortlisted under `criteria`."""
+        min_years = criteria["MIN_EXPERIENCE_YEARS"]
+        max_rate = criteria["MAX_HOURLY_RATE"]
+        min_hours = criteria["MIN_AVAILABILITY_HOURS"]
+        tier1 = tuple(criteria["TIER_1_COMPANIES"])
+        countries = tuple(criteria["ELIGIBLE_COUNTRIES"])
+
+        experience = self._cached(
+            ("years", min_years), lambda: _mask(years >= min_years for years in self.years)
+        ) | self._cached(
+            ("tier1", tier1), lambda: self._tier1_mask(tier1)
+        )
+        compensation = self._cached(
+            ("rate", max_rate), lambda: _mask(rate <= max_rate for rate in self.rates)
+        ) & self._cached(
+            ("hours", min_hours), lambda: _mask(hours >= min_hours for hours in self.availability)
+        )
+        location = self._cached(
+            ("countries", countries), lambda: self._location_mask(countries)
+        )
+        return self.valid_mask & experience & compensation & location
+
+    def ids(self, mask):
+        """Applicant IDs of the profiles set in `mask`."""
+        bits = bin(mask)[:1:-1]  # Lowest bit first, without the "0b" prefix
+        return [self.applicant_ids[index] for index, bit in enumerate(bits) if bit == "1"]
+
+
+def sweep_criteria(profiles, configurations, baseline=None, include_ids=True):
+    """Evaluate every criteria set in `configurations` against `profiles`.
+
+    `profiles` is a ProfileSet (or an iterable of applicant records, which is
+    parsed once). Each configuration is a dict of criteria overriding
+    `baseline` (config.py's criteria by default). Returns one result per
+    configuration: its criteria, the shortlist count, and the Applicant IDs
+    added and removed compared with the baseline (counts only if
+    `include_ids` is False).
+    """
+    if not isinstance(profiles, ProfileSet):
+        profiles = ProfileSet(profiles)
+    baseline = {**current_criteria(), **(baseline or {})}
+    baseline_mask = profiles.shortlist_mask(baseline)
+
+    results = []
+    for overrides in configurations:
+        criteria = {**baseline, **overrides}
+        mask = profiles.shortlist_mask(criteria)
+        added = mask & ~baseline_mask
+        removed = baseline_mask & ~mask
+        result = {
+            "criteria": overrides,
+            "shortlisted": mask.bit_count(),
+            "added_count": added.bit_count(),
+            "removed_count": removed.bit_count(),
+        }
+        if include_ids:
+            result["added"] = profiles.ids(added)
+            result["removed"] = profiles.ids(removed)
+        results.append(result)
+    return results
+
+
+def load_profiles(snapshot_path=None):
+    """Parse profiles from a snapshot file, or read them from Airtable (read-only)."""
+    if snapshot_path:
+        from snapshot import iter_snapshot
+
+        return ProfileSet(iter_snapshot(snapshot_path))
+
+    from shortlist_leads import APPLICANT_FIELDS, HAS_COMPRESSED_JSON, get_table
+
+    applicants_table = get_table(config.APPLICANTS_TABLE)
+    return ProfileSet(applicants_table.all(fields=APPLICANT_FIELDS, formula=HAS_COMPRESSED_JSON))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep shortlisting criteria without writing to Airtable.")
+    parser.add_argument("grid", help="JSON file: {criterion: [values]} or a list of criteria dicts")
+    parser.add_argument("--snapshot", help="Read profiles from this snapshot instead of Airtable")
+    parser.add_argument("--ids", action="store_true", help="Print added/removed Applicant IDs")
+    args = parser.parse_args()
+
+    with open(args.grid, encoding="utf-8") as grid_file:
+        configurations = expand_grid(json.load(grid_file))
+
+    profiles = load_profiles(args.snapshot)
+    results = sweep_criteria(profiles, configurations, include_ids=args.ids)
+    baseline_count = profiles.shortlist_mask(current_criteria()).bit_count()
+
+    print(f"{len(profiles)} profiles, {baseline_count} shortlisted with current criteria\n")
+    for result in results:
+        print(f"{result['shortlisted']:>7} shortlisted  +{result['added_count']:<6} "
+              f"-{result['removed_count']:<6} {json.dumps(result['criteria'])}")
+        if args.ids:
+            print(f"    added: {', '.join(result['added'])}")
+            print(f"    removed: {', '.join(result['removed'])}")
+
+
+if __name__ == "__main__":
+    main()
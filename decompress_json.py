@@ -1,22 +1,27 @@
 """Script to decompress JSON data back into normalized Airtable tables."""
 import json
 from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
 from config import (
-    AIRTABLE_API_KEY, AIRTABLE_BASE_ID,
     APPLICANTS_TABLE, PERSONAL_DETAILS_TABLE,
     WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE
 )
+from shortlist_leads import HAS_COMPRESSED_JSON
+
+# Applicants fields this script reads
+APPLICANT_FIELDS = ["Applicant ID", "Compressed JSON"]
 
 
 def get_table(table_name):
     """Get Airtable table instance."""
-    return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
 
 
 def find_linked_record(table, applicant_id):
     """Find existing record linked to applicant."""
     formula = f"{{Applicant ID}} = '{applicant_id}'"
-    records = table.all(formula=formula)
+    records = table.all(formula=formula, fields=["Applicant ID"])  # Only the record ID is used
     return records[0] if records else None
 
 
@@ -46,7 +51,9 @@ def upsert_work_experience(applicant_id, applicant_record_id, experience_data):
     experience_table = get_table(WORK_EXPERIENCE_TABLE)
     
     # Delete existing records to ensure exact match with JSON
-    existing_records = experience_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
+    existing_records = experience_table.all(
+        formula=f"{{Applicant ID}} = '{applicant_id}'", fields=["Applicant ID"]
+    )
     for record in existing_records:
         experience_table.delete(record['id'])
     
@@ -122,7 +129,7 @@ def decompress_applicant(applicant_record):
 def decompress_all_applicants():
     """Decompress data for all applicants with compressed JSON."""
     applicants_table = get_table(APPLICANTS_TABLE)
-    applicants = applicants_table.all()
+    applicants = applicants_table.all(fields=APPLICANT_FIELDS, formula=HAS_COMPRESSED_JSON)
     
     for applicant in applicants:
         if applicant['fields'].get('Compressed JSON'):
@@ -0,0 +1,158 @@
+"""Near-duplicate applicant detection for reusing LLM evaluations.
+
+A profile is reduced to a set of normalized tokens covering its work
+experience, salary preferences and location. Name and contact details are
+left out, so the same profile submitted under a new Applicant ID still
+matches. Profiles are indexed with MinHash signatures and LSH banding, so
+finding candidates costs about the same however large the index grows.
+Candidates are then confirmed with the exact Jaccard similarity of their
+token sets. Salary and location tokens must match exactly, since a change to
+rate, availability or country can flip the shortlisting criteria on its own.
+"""
+import hashlib
+import re
+from shortlist_leads import parse_date
+
+NUM_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_COMPANY_SUFFIXES = re.compile(r"\b(inc|llc|ltd|gmbh|corp|corporation|co|plc)\b\.?")
+# Token kinds that must be identical for a match, whatever the overall similarity
+EXACT_PREFIXES = ("rate:", "minimum_rate:", "currency:", "availability:", "location:")
+
+
+def _permutations():
+    # Fixed coefficients so signatures are identical across processes and runs
+    coefficients = []
+    for index in range(NUM_PERMUTATIONS):
+        digest = hashlib.sha256(f"minhash-{index}".encode()).digest()
+        a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:16], "big") % _MERSENNE_PRIME
+        coefficients.append((a, b))
+    return coefficients
+
+
+_PERMUTATIONS = _permutations()
+
+
+def _normalize(text):
+    return " ".join(str(text).lower().replace(",", " ").split())
+
+
+def _month(date_str):
+    """Normalize any supported date format to YYYY-MM ("current" for open-ended roles)."""
+    parsed = parse_date(date_str)
+    if parsed:
+        return parsed.strftime("%Y-%m")
+    return "current" if not date_str else _normalize(date_str)
+
+
+def profile_tokens(data):
+    """Normalized token set for a parsed Compressed JSON profile."""
+    tokens = set()
+    for exp in data.get("experience", []):
+        company = _COMPANY_SUFFIXES.sub("", _normalize(exp.get("company", ""))).strip()
+        tokens.add(f"company:{company}")
+        tokens.add(f"role:{company}|{_month(exp.get('start'))}|{_month(exp.get('end'))}")
+        tokens.update(f"title:{word}" for word in _normalize(exp.get("title", "")).split())
+        tokens.update(
+            f"tech:{_normalize(tech)}"
+            for tech in str(exp.get("technologies", "")).split(",") if tech.strip()
+        )
+
+    salary = data.get("salary", {})
+    for key in ("rate", "minimum_rate", "currency", "availability"):
+        if key in salary:
+            tokens.add(f"{key}:{_normalize(salary[key])}")
+
+    location = data.get("personal", {}).get("location", "")
+    tokens.update(f"location:{word}" for word in _normalize(location).split())
+    return tokens
+
+
+def exact_tokens(tokens):
+    """The salary and location tokens of a profile token set."""
+    return {token for token in tokens if token.startswith(EXACT_PREFIXES)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(tokens):
+    """MinHash signature of a token set."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+        for token in tokens
+    ] or [0]
+    return [
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_bands(threshold):
+    """Choose (bands, rows) so pairs at `threshold` similarity become candidates.
+
+    The LSH S-curve crosses 50% at about (1 / bands) ** (1 / rows); rows is
+    picked to put that point a little below the threshold, to keep recall high.
+    """
+    options = [(NUM_PERMUTATIONS // rows, rows) for rows in (1, 2, 4, 8, 16, 32)]
+    below = [
+        (bands, rows) for bands, rows in options
+        if (1 / bands) ** (1 / rows) <= threshold
+    ]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1])) if below else options[0]
+
+
+class DuplicateIndex:
+    """MinHash/LSH index from profile token sets to existing evaluations."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold)
+        self._buckets = {}  # (band, band hash) -> keys
+        self._entries = {}  # key -> (tokens, evaluation)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def tokens(self, key):
+        """The profile token set indexed for `key`."""
+        return self._entries[key][0]
+
+    def _band_keys(self, tokens):
+        signature = minhash(tokens)
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key, tokens, evaluation):
+        """Index `evaluation` for the profile `tokens`, replacing any entry for `key`."""
+        previous = self._entries.get(key)
+        self._entries[key] = (tokens, evaluation)
+        if previous is not None and previous[0] == tokens:
+            return
+        # Stale buckets for a replaced key are harmless: find() re-checks current tokens
+        for band_key in self._band_keys(tokens):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def find(self, tokens):
+        """Return (key, similarity, evaluation) of the most similar profile at or above the threshold.
+
+        Profiles whose salary or location tokens differ from `tokens` never match.
+        """
+        candidates = set()
+        for band_key in self._band_keys(tokens):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        required = exact_tokens(tokens)
+        best = None
+        for key in candidates:
+            indexed_tokens, evaluation = self._entries[key]
+            if exact_tokens(indexed_tokens) != required:
+                continue
+            similarity = jaccard(tokens, indexed_tokens)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity, evaluation)
+        return best
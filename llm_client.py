@@ -0,0 +1,202 @@
+"""Resilient structured-output calls to the OpenAI chat completions API.
+
+Requests ask for schema-constrained JSON (`response_format` json_schema), and
+replies that are still not quite valid JSON are repaired locally. Only
+transient errors (rate limits, timeouts, connection failures, 5xx) are retried,
+with exponential backoff and full jitter; anything else fails at once.
+Consecutive transient failures open a process-wide circuit breaker, which
+pauses every caller for a cool-down before letting a single probe call
+through.
+
+Failures raise EvaluationError rather than returning a placeholder, so callers
+can leave the applicant untouched and requeue it.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+import config
+from config import (
+    LLM_MODEL, LLM_TIMEOUT_SECONDS, LLM_MAX_ATTEMPTS,
+    LLM_BACKOFF_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+    LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_COOLDOWN_SECONDS, LLM_CIRCUIT_MAX_PAUSES
+)
+
+
+class EvaluationError(Exception):
+    """An LLM evaluation failed; `transient` is True if trying again later may succeed."""
+
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+class CircuitOpenError(EvaluationError):
+    """The provider stayed degraded through LLM_CIRCUIT_MAX_PAUSES cool-downs."""
+
+    def __init__(self, message):
+        super().__init__(message, transient=True)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and holds callers for `cooldown` seconds.
+
+    After a cool-down one probe call is let through (half-open): success closes
+    the circuit, failure opens it again. Once it has opened `max_pauses` times
+    in a row, callers get CircuitOpenError straight away instead of waiting
+    out the cool-down; a probe is still let through each time it expires, so
+    the breaker closes again once the provider recovers.
+    """
+
+    def __init__(self, failure_threshold, cooldown, max_pauses):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_pauses = max_pauses
+        self._failures = 0
+        self._opened_until = None
+        self._pauses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_until is not None
+
+    def before_call(self):
+        """Wait out an open circuit; raise CircuitOpenError if it keeps reopening."""
+        while True:
+            with self._lock:
+                if self._opened_until is None:
+                    return
+                wait = self._opened_until - time.monotonic()
+                if wait <= 0:
+                    # Half-open: this caller probes, later ones wait for its outcome
+                    self._opened_until = time.monotonic() + self.cooldown
+                    return
+                if self._pauses > self.max_pauses:
+                    raise CircuitOpenError(f"LLM provider still failing after {self.max_pauses} pauses")
+            print(f"LLM circuit open; pausing {wait:.0f}s")
+            time.sleep(wait)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_until = None
+            self._pauses = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_until is not None or self._failures >= self.failure_threshold:
+                # A failed half-open probe reopens straight away
+                self._opened_until = time.monotonic() + self.cooldown
+                self._pauses += 1
+                self._failures = 0
+
+
+# Shared by every LLM call in the process
+llm_circuit = CircuitBreaker(LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_COOLDOWN_SECONDS, LLM_CIRCUIT_MAX_PAUSES)
+
+# Requests and tokens used by this process (requests counts attempts, retries included)
+llm_usage = Counter()
+
+
+@lru_cache(maxsize=None)
+def openai_client():
+    """OpenAI client with the SDK's own retries disabled (call_structured retries instead).
+
+    OPENAI_BASE_URL points it at another OpenAI-compatible server, such as a
+    local fake used for benchmarks.
+    """
+    if not config.OPENAI_API_KEY:
+        raise EvaluationError("OPENAI_API_KEY not found in environment variables")
+
+    import openai  # Imported here so non-LLM steps don't pay for the SDK
+
+    return openai.OpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL,
+                         max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
+
+
+def is_transient(error):
+    """Whether an OpenAI SDK error is worth retrying."""
+    import openai
+
+    # APITimeoutError is a subclass of APIConnectionError
+    return isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError))
+
+
+def backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff, honouring a Retry-After header if the error has one."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+    response = getattr(error, "response", None)
+    try:
+        retry_after = float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return delay
+    return max(delay, min(retry_after, LLM_BACKOFF_MAX_SECONDS))
+
+
+def repair_json(text):
+    """Best-effort fix-up of almost-valid JSON: code fences, surrounding prose, trailing commas."""
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    return re.sub(r",\s*([}\]])", r"\1", text)
+
+
+def parse_json_reply(text):
+    """Parse a JSON object reply, repairing it if needed; raise EvaluationError if it can't be."""
+    if not text:
+        raise EvaluationError("Empty LLM reply")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError as e:
+        raise EvaluationError(f"Unparseable LLM reply: {e}") from e
+
+
+def call_structured(messages, schema, max_tokens=500):
+    """Request a reply matching the json_schema `schema` and return it parsed.
+
+    Transient errors are retried up to LLM_MAX_ATTEMPTS times; other errors,
+    refusals, truncated replies and unparseable JSON raise EvaluationError.
+    """
+    client = openai_client()
+    for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+        llm_circuit.before_call()
+        llm_usage["requests"] += 1
+        try:
+            response = client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=messages,
+                response_format={"type": "json_schema", "json_schema": schema},
+                temperature=0.3,
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            if not is_transient(e):
+                raise EvaluationError(f"OpenAI API error: {e}") from e
+            llm_circuit.record_failure()
+            if attempt == LLM_MAX_ATTEMPTS:
+                raise EvaluationError(f"OpenAI API error after {attempt} attempts: {e}", transient=True) from e
+            delay = backoff_delay(attempt, e)
+            print(f"Transient OpenAI error ({type(e).__name__}); retry {attempt}/{LLM_MAX_ATTEMPTS - 1} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        llm_circuit.record_success()
+        if getattr(response, "usage", None):
+            llm_usage["prompt_tokens"] += response.usage.prompt_tokens or 0
+            llm_usage["completion_tokens"] += response.usage.completion_tokens or 0
+        choice = response.choices[0]
+        if getattr(choice.message, "refusal", None):
+            raise EvaluationError(f"LLM refused: {choice.message.refusal}")
+        if choice.finish_reason == "length":
+            raise EvaluationError("LLM reply was cut off at max_tokens")
+        return parse_json_reply(choice.message.content)
@@ -1,161 +1,565 @@
 """LLM-powered evaluation of applicants using LangSmith integration."""
 import json
+import re
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, List
-import openai
-from langsmith import Client
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+import config
 from config import (
-    AIRTABLE_API_KEY, AIRTABLE_BASE_ID, APPLICANTS_TABLE,
-    OPENAI_API_KEY, LANGSMITH_API_KEY, LANGSMITH_PROJECT
+    APPLICANTS_TABLE, LLM_MODEL, LLM_PACK_SIZE, LLM_EVALUATION_SCOPE, LLM_MAX_EVALUATIONS_PER_RUN,
+    LLM_DUPLICATE_THRESHOLD, LLM_FLUSH_EVERY_RECORDS, REPLAY_OUTPUT_PATH
 )
 from pyairtable import Table
+from rate_limit import rate_limit_table
+from dedupe import DuplicateIndex, profile_tokens
+from llm_client import CircuitOpenError, EvaluationError, call_structured, llm_usage
+from shortlist_leads import CRITERIA_COUNT, HAS_COMPRESSED_JSON, rule_score
+from sharding import other_shards_formula, select_shard, shard_formula
+from write_buffer import applicant_writes
+
+# Applicants fields this stage reads; stored evaluations are read too when they can be reused
+APPLICANT_FIELDS = ["Applicant ID", "Compressed JSON"]
+EVALUATION_FIELDS = ["LLM Summary", "LLM Score", "LLM Follow-Ups", "LLM Fingerprint"]
+
+# Note appended to summaries reused from another applicant's evaluation
+REUSE_NOTE = re.compile(r" \(Reused from near-duplicate [^)]*\)$")
+
+# Structured-output schema every LLM evaluation must match
+EVALUATION_SCHEMA = {
+    "name": "applicant_evaluation",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "score": {"type": "integer", "description": "1-10 rating"},
+            "summary": {"type": "string", "description": "2-3 sentence summary"},
+            "follow_ups": {"type": "string", "description": "Specific questions to ask"},
+            "strengths": {"type": "array", "items": {"type": "string"}},
+            "concerns": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["score", "summary", "follow_ups", "strengths", "concerns"],
+        "additionalProperties": False,
+    },
+}
+
+# Packed requests return one keyed evaluation per applicant
+PACKED_SCHEMA = {
+    "name": "applicant_evaluations",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "evaluations": {
+                "type": "array",
+                "items": {
+                    **EVALUATION_SCHEMA["schema"],
+                    "properties": {
+                        "applicant_id": {"type": "string"},
+                        **EVALUATION_SCHEMA["schema"]["properties"],
+                    },
+                    "required": ["applicant_id"] + EVALUATION_SCHEMA["schema"]["required"],
+                },
+            },
+        },
+        "required": ["evaluations"],
+        "additionalProperties": False,
+    },
+}
+MAX_TOKENS_PER_EVALUATION = 500
+
+# Evaluation scope -> minimum number of shortlisting criteria an applicant must meet
+EVALUATION_SCOPES = {
+    "all": 0,
+    "near_miss": CRITERIA_COUNT - 1,  # Shortlisted, or failing a single criterion
+    "shortlisted": CRITERIA_COUNT,
+}
 
 
 def get_table(table_name: str):
     """Get Airtable table instance."""
-    return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
 
 
 def evaluate_applicant_with_llm(applicant_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Evaluate a single applicant using LLM."""
+    """Evaluate a single applicant using LLM.
+
+    Raises EvaluationError if no valid evaluation could be obtained; nothing
+    should be written for the applicant then.
+    """
+    # Parse compressed JSON
     try:
-        # Parse compressed JSON
-        compressed_data = applicant_data.get("Compressed JSON", "{}")
-        data = json.loads(compressed_data)
-        
-        # Prepare prompt for LLM evaluation
-        prompt = f"""
-        Evaluate this applicant for a technical role:
-
-        Experience: {data.get('experience', [])}
-        Skills: {data.get('skills', [])}
-        Education: {data.get('education', [])}
-        Salary Preferences: {data.get('salary', {})}
-        Personal Details: {data.get('personal', {})}
-
-        Provide evaluation in this JSON format:
-        {{
-            "score": <1-10 rating>,
-            "summary": "<2-3 sentence summary>",
-            "follow_ups": "<specific questions to ask>",
-            "strengths": ["<list of strengths>"],
-            "concerns": ["<list of concerns>"]
-        }}
-        """
-        
-        # Initialize OpenAI client
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        
-        # Make LLM call
+        data = json.loads(applicant_data.get("Compressed JSON", "{}"))
+    except json.JSONDecodeError as e:
+        raise EvaluationError(f"Invalid compressed JSON: {e}") from e
+    
+    # Prepare prompt for LLM evaluation (the reply format is set by EVALUATION_SCHEMA)
+    prompt = f"""
+    Evaluate this applicant for a technical role:
+
+    Experience: {data.get('experience', [])}
+    Skills: {data.get('skills', [])}
+    Education: {data.get('education', [])}
+    Salary Preferences: {data.get('salary', {})}
+    Personal Details: {data.get('personal', {})}
+
+    Give a score from 1 to 10, a 2-3 sentence summary, specific follow-up
+    questions to ask, and lists of strengths and concerns.
+    """
+    
+    evaluation = validate_evaluation(call_structured([
+        {"role": "system", "content": "You are an expert technical recruiter evaluating candidates."},
+        {"role": "user", "content": prompt}
+    ], EVALUATION_SCHEMA))
+    
+    log_run(
+        "applicant-evaluation",
+        inputs={"applicant_data": data, "prompt": prompt},
+        outputs={"evaluation": evaluation},
+        metadata={"applicant_id": applicant_data.get("Applicant ID")}
+    )
+    
+    return evaluation
+
+
+def log_run(name: str, inputs: Dict[str, Any], outputs: Dict[str, Any], metadata: Dict[str, Any]):
+    """Log an LLM run to LangSmith if configured; logging failures are only warned about."""
+    if not config.LANGSMITH_API_KEY:
+        return
+    try:
+        langsmith_client().create_run(
+            name=name,
+            run_type="chain",
+            project_name=config.LANGSMITH_PROJECT,
+            inputs=inputs,
+            outputs=outputs,
+            metadata={**metadata, "model": LLM_MODEL, "timestamp": datetime.now().isoformat()}
+        )
+    except Exception as e:
+        print(f"Warning: LangSmith logging failed: {e}")
+
+
+def compact_profile(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a parsed profile an evaluation needs, with short keys and no contact details."""
+    salary = data.get("salary", {})
+    return {
+        "location": data.get("personal", {}).get("location", ""),
+        "experience": [
+            [exp.get("company", ""), exp.get("title", ""), exp.get("start", ""),
+             exp.get("end", "") or "present", exp.get("technologies", "")]
+            for exp in data.get("experience", [])
+        ],
+        "rate": salary.get("rate"),
+        "min_rate": salary.get("minimum_rate"),
+        "currency": salary.get("currency"),
+        "hours": salary.get("availability"),
+    }
+
+
+def evaluate_applicants_with_llm(applicants_data: List[Dict[str, Any]]) -> List[Any]:
+    """Evaluate several applicants in one packed LLM request.
+
+    Returns one entry per applicant, in order: its evaluation, or the
+    EvaluationError explaining why there is none. Applicants missing from the
+    reply, or whose entry fails validation, are evaluated on their own with
+    evaluate_applicant_with_llm. CircuitOpenError is raised, not returned.
+    """
+    if len(applicants_data) == 1:
         try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert technical recruiter evaluating candidates."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            
-            # Parse LLM response
-            llm_response = response.choices[0].message.content
-            evaluation = json.loads(llm_response)
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            # Return a default evaluation if LLM fails
-            evaluation = {
-                "score": 5,
-                "summary": "LLM evaluation failed - manual review required",
-                "follow_ups": "Please review this candidate manually",
-                "strengths": ["Manual review needed"],
-                "concerns": ["LLM evaluation failed"]
-            }
-        
-        # Log to LangSmith if configured
-        if LANGSMITH_API_KEY:
+            return [evaluate_applicant_with_llm(applicants_data[0])]
+        except CircuitOpenError:
+            raise
+        except EvaluationError as e:
+            return [e]
+
+    results = [None] * len(applicants_data)
+    profiles = {}  # Applicant ID -> index in applicants_data
+    packed = []
+    for index, applicant_data in enumerate(applicants_data):
+        applicant_id = str(applicant_data.get("Applicant ID", index))
+        try:
+            data = json.loads(applicant_data.get("Compressed JSON", "{}"))
+        except json.JSONDecodeError as e:
+            results[index] = EvaluationError(f"Invalid compressed JSON: {e}")
+            continue
+        if applicant_id not in profiles:  # A repeated ID falls back to its own call
+            profiles[applicant_id] = index
+            packed.append({"applicant_id": applicant_id, **compact_profile(data)})
+
+    if packed:
+        prompt = (
+            "Evaluate each of these applicants for a technical role. Experience entries are "
+            "[company, title, start, end, technologies]; rates are hourly, hours are per week.\n"
+            "For every applicant, return its applicant_id with a score from 1 to 10, a 2-3 sentence "
+            "summary, specific follow-up questions to ask, and lists of strengths and concerns.\n\n"
+            + "\n".join(json.dumps(profile, separators=(",", ":")) for profile in packed)
+        )
+        try:
+            reply = call_structured([
+                {"role": "system", "content": "You are an expert technical recruiter evaluating candidates."},
+                {"role": "user", "content": prompt}
+            ], PACKED_SCHEMA, max_tokens=MAX_TOKENS_PER_EVALUATION * len(packed))
+            entries = reply.get("evaluations", []) if isinstance(reply, dict) else []
+            pack_error = None
+        except CircuitOpenError:
+            raise
+        except EvaluationError as e:
+            if e.transient:
+                # The provider is struggling; retrying each applicant now would only add load
+                return [result or e for result in results]
+            print(f"Packed evaluation failed ({e}); evaluating {len(packed)} applicants one by one")
+            entries = []
+            pack_error = str(e)
+
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            index = profiles.get(str(entry.get("applicant_id")))
+            if index is None or results[index] is not None:
+                continue
             try:
-                langsmith_client = Client(api_key=LANGSMITH_API_KEY)
-                langsmith_client.create_run(
-                    name="applicant-evaluation",
-                    run_type="chain",
-                    project_name=LANGSMITH_PROJECT,
-                    inputs={"applicant_data": data, "prompt": prompt},
-                    outputs={"evaluation": evaluation},
-                    metadata={
-                        "applicant_id": applicant_data.get("Applicant ID"),
-                        "model": "gpt-4",
-                        "timestamp": datetime.now().isoformat()
-                    }
+                results[index] = validate_evaluation(
+                    {name: value for name, value in entry.items() if name != "applicant_id"}
                 )
-            except Exception as e:
-                print(f"Warning: LangSmith logging failed: {e}")
-        
-        return evaluation
-        
-    except Exception as e:
-        print(f"Error evaluating applicant: {e}")
-        return {
-            "score": 0,
-            "summary": f"Evaluation failed: {str(e)}",
-            "follow_ups": "Please review manually",
-            "strengths": [],
-            "concerns": ["Evaluation error occurred"]
-        }
-
-
-def update_applicant_evaluation(applicant_record_id: str, evaluation: Dict[str, Any]):
-    """Update applicant record with LLM evaluation results."""
-    applicants_table = get_table(APPLICANTS_TABLE)
-    
+            except EvaluationError as e:
+                print(f"Invalid packed evaluation for {entry.get('applicant_id')}: {e}")
+
+        # One run per pack; applicants without a valid entry are logged again by their own call
+        log_run(
+            "applicant-evaluation-pack",
+            inputs={"applicant_ids": list(profiles), "prompt": prompt},
+            outputs={
+                "evaluations": {applicant_id: results[index] for applicant_id, index in profiles.items()},
+                "error": pack_error,
+            },
+            metadata={"applicant_ids": list(profiles), "pack_size": len(packed)}
+        )
+
+    # Missing or malformed entries get a single-applicant call
+    for index, result in enumerate(results):
+        if result is None:
+            try:
+                results[index] = evaluate_applicant_with_llm(applicants_data[index])
+            except CircuitOpenError:
+                raise
+            except EvaluationError as e:
+                results[index] = e
+    return results
+
+
+def validate_evaluation(evaluation: Any) -> Dict[str, Any]:
+    """Check a parsed evaluation has the EVALUATION_SCHEMA fields and a 1-10 score."""
+    if not isinstance(evaluation, dict):
+        raise EvaluationError("LLM reply is not a JSON object")
+    missing = [name for name in EVALUATION_SCHEMA["schema"]["required"] if name not in evaluation]
+    if missing:
+        raise EvaluationError(f"LLM reply is missing {', '.join(missing)}")
+    score = evaluation["score"]
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 10:
+        raise EvaluationError(f"LLM score out of range: {score!r}")
+    return evaluation
+
+
+@lru_cache(maxsize=None)
+def langsmith_client():
+    """LangSmith client, created once per process."""
+    from langsmith import Client
+
+    return Client(api_key=config.LANGSMITH_API_KEY)
+
+
+def update_applicant_evaluation(applicant_record_id: str, evaluation: Dict[str, Any], write_buffer=None,
+                                fingerprint: Optional[set] = None, source_id: Optional[str] = None):
+    """Update applicant record with LLM evaluation results.
+
+    `fingerprint` is the token set of the profile the LLM evaluated, and
+    `source_id` the Applicant ID it belongs to; both are stored so later runs
+    can reuse the evaluation for near-duplicate profiles. The update is staged
+    in `write_buffer` if given, otherwise written immediately.
+    """
     fields = {
         "LLM Summary": evaluation.get("summary", ""),
         "LLM Score": evaluation.get("score", 0),
         "LLM Follow-Ups": evaluation.get("follow_ups", "")
     }
+    if fingerprint is not None:
+        fields["LLM Fingerprint"] = json.dumps({"source": source_id, "tokens": sorted(fingerprint)})
+    
+    if write_buffer is not None:
+        write_buffer.stage(applicant_record_id, fields)
+        return
     
+    applicants_table = get_table(APPLICANTS_TABLE)
     applicants_table.update(applicant_record_id, fields)
     print(f"Updated evaluation for applicant {applicant_record_id}")
 
 
-def evaluate_all_applicants():
-    """Evaluate all applicants using LLM and update their records."""
-    print("Starting LLM evaluation of all applicants...")
-    
-    applicants_table = get_table(APPLICANTS_TABLE)
-    
-    # Get all applicants
-    applicants = applicants_table.all()
-    
-    if not applicants:
-        print("No applicants found to evaluate.")
-        return
-    
-    print(f"Found {len(applicants)} applicants to evaluate.")
-    
-    evaluated_count = 0
+def schedule_evaluations(applicants: List[Dict[str, Any]],
+                         scope: str = LLM_EVALUATION_SCOPE) -> List[Dict[str, Any]]:
+    """Choose which applicants get an evaluation this run, highest priority first.
+
+    Applicants are gated by their rule score (criteria met out of
+    CRITERIA_COUNT) according to `scope` and ordered shortlisted first, then by
+    rule score, then newest first. The LLM_MAX_EVALUATIONS_PER_RUN budget is
+    applied while evaluating, since reused evaluations don't count against it.
+    """
+    if scope not in EVALUATION_SCOPES:
+        raise ValueError(f"Unknown LLM evaluation scope: {scope} (valid: {', '.join(EVALUATION_SCOPES)})")
+
+    min_score = EVALUATION_SCOPES[scope]
+    queue = []
+    gated_count = 0
     for applicant in applicants:
-        applicant_id = applicant['fields'].get('Applicant ID', 'Unknown')
-        print(f"Evaluating applicant: {applicant_id}")
-        
+        fields = applicant['fields']
+        applicant_id = fields.get('Applicant ID', 'Unknown')
+
         # Skip if no compressed JSON
-        if not applicant['fields'].get('Compressed JSON'):
+        if not fields.get('Compressed JSON'):
             print(f"Skipping {applicant_id} - no compressed JSON")
             continue
+
+        score = rule_score(fields)
+        if score < min_score:
+            gated_count += 1
+            continue
+
+        priority = (score == CRITERIA_COUNT, score, applicant.get('createdTime', ''))
+        queue.append((priority, applicant))
+
+    queue.sort(key=lambda item: item[0], reverse=True)
+    scheduled = [applicant for _, applicant in queue]
+
+    if gated_count:
+        print(f"Skipped {gated_count} applicants below the '{scope}' rule threshold.")
+
+    return scheduled
+
+
+def parse_fingerprint(fields: Dict[str, Any]):
+    """Return (source Applicant ID, token set) from a stored LLM Fingerprint, or None.
+
+    Fingerprints written before the source was recorded are a bare token list;
+    they count as the applicant's own unless the summary carries REUSE_NOTE.
+    """
+    try:
+        fingerprint = json.loads(fields.get("LLM Fingerprint") or "null")
+    except json.JSONDecodeError:
+        return None
+    if isinstance(fingerprint, list):
+        if REUSE_NOTE.search(fields.get("LLM Summary", "")):
+            return None
+        return fields.get('Applicant ID'), set(fingerprint)
+    if isinstance(fingerprint, dict) and isinstance(fingerprint.get("tokens"), list):
+        return fingerprint.get("source"), set(fingerprint["tokens"])
+    return None
+
+
+def build_duplicate_index(applicants: List[Dict[str, Any]],
+                          index: Optional[DuplicateIndex] = None) -> Optional[DuplicateIndex]:
+    """Index the stored LLM evaluations of `applicants` by the profile the LLM evaluated.
+
+    Evaluations an applicant reused from another are left out, so new profiles
+    are only ever compared with profiles the LLM actually saw. They are added
+    to `index` if given. Returns None when duplicate reuse is disabled
+    (LLM_DUPLICATE_THRESHOLD is None).
+    """
+    if LLM_DUPLICATE_THRESHOLD is None:
+        return None
+
+    index = index if index is not None else DuplicateIndex(LLM_DUPLICATE_THRESHOLD)
+    for applicant in applicants:
+        fields = applicant['fields']
+        applicant_id = fields.get('Applicant ID', applicant['id'])
+        fingerprint = parse_fingerprint(fields) if "LLM Score" in fields else None
+        if fingerprint is None or fingerprint[0] != applicant_id:
+            continue
+        index.add(applicant_id, fingerprint[1], {
+            "score": fields["LLM Score"],
+            "summary": fields.get("LLM Summary", ""),
+            "follow_ups": fields.get("LLM Follow-Ups", ""),
+        })
+    return index
+
+
+def find_reusable_evaluation(applicant: Dict[str, Any], duplicate_index: Optional[DuplicateIndex] = None):
+    """Return the applicant's profile tokens and a near-duplicate's (source Applicant ID, evaluation, source tokens).
+
+    The second item is None if nothing indexed is similar enough. The source
+    is the applicant itself for an unchanged resubmission, and its tokens are
+    those of the profile the LLM evaluated.
+    """
+    fields = applicant['fields']
+    applicant_id = fields.get('Applicant ID', applicant['id'])
+    try:
+        tokens = profile_tokens(json.loads(fields.get("Compressed JSON", "{}")))
+    except json.JSONDecodeError:
+        tokens = None
+
+    match = duplicate_index.find(tokens) if duplicate_index is not None and tokens else None
+    if not match:
+        return tokens, None
+
+    source_id, similarity, evaluation = match
+    if source_id != applicant_id:
+        summary = REUSE_NOTE.sub("", evaluation.get("summary", ""))
+        evaluation = {**evaluation, "summary": f"{summary} (Reused from near-duplicate {source_id}, "
+                                              f"{similarity:.0%} similar)"}
+    print(f"Reusing evaluation of {source_id} for {applicant_id} ({similarity:.0%} similar)")
+    return tokens, (source_id, evaluation, duplicate_index.tokens(source_id))
+
+
+def save_evaluation(applicant: Dict[str, Any], evaluation: Dict[str, Any], tokens: Optional[set],
+                    duplicate_index: Optional[DuplicateIndex] = None, write_buffer=None, reused=None):
+    """Update an applicant's record with its evaluation, indexing it for reuse if the LLM made it.
+
+    `reused` is the (source Applicant ID, evaluation, source tokens) from
+    find_reusable_evaluation when the evaluation was reused; the source's ID
+    and tokens are stored then, and nothing new is indexed, so reuse never
+    chains from one near-duplicate to the next.
+    """
+    applicant_id = applicant['fields'].get('Applicant ID', applicant['id'])
+    if reused:
+        source_id, _, tokens = reused
+    else:
+        source_id = applicant_id
+        if duplicate_index is not None and tokens:
+            duplicate_index.add(applicant_id, tokens, evaluation)
+    update_applicant_evaluation(
+        applicant['id'], evaluation, write_buffer,
+        fingerprint=tokens if duplicate_index is not None and tokens else None, source_id=source_id
+    )
+    print(f"Completed evaluation for {applicant_id} (Score: {evaluation.get('score', 'N/A')})")
+
+
+def evaluate_with_reuse(applicant: Dict[str, Any], duplicate_index: Optional[DuplicateIndex] = None,
+                        write_buffer=None) -> Optional[str]:
+    """Evaluate an applicant and update its record, reusing a near-duplicate's evaluation if indexed.
+
+    Returns the Applicant ID whose evaluation was reused (the applicant's own
+    for an unchanged resubmission), or None if the LLM was called. If the LLM
+    call fails, EvaluationError propagates and nothing is staged.
+    """
+    tokens, reused = find_reusable_evaluation(applicant, duplicate_index)
+    if reused:
+        source_id, evaluation, _ = reused
+    else:
+        source_id, evaluation = None, evaluate_applicant_with_llm(applicant['fields'])
+    save_evaluation(applicant, evaluation, tokens, duplicate_index, write_buffer, reused)
+    return source_id
+
+
+def evaluate_all_applicants(write_buffer=None, shard=None, snapshot_path=None, output_path=REPLAY_OUTPUT_PATH,
+                            budget=LLM_MAX_EVALUATIONS_PER_RUN):
+    """Evaluate scheduled applicants, or those in `shard` (index, count), using LLM and update their records.
+
+    At most `budget` applicants are sent to the LLM (None for no limit);
+    applicants that reuse a near-duplicate's evaluation don't count, and the
+    rest of the queue is still checked for reuse once the budget is spent.
+    Updates are staged in `write_buffer` when one is given; otherwise they are
+    written every LLM_FLUSH_EVERY_RECORDS records and at the end of the run.
+    With `snapshot_path`, applicants are read from that NDJSON snapshot instead
+    of Airtable and results go to the local file `output_path` (unless
+    `write_buffer` is given). Applicants whose evaluation fails keep their
+    current fields and are evaluated again on the next run.
+    """
+    print("Starting LLM evaluation of all applicants...")
+    
+    evaluated_count = 0
+    reused_count = 0
+    deferred_count = 0
+    over_budget_count = 0
+    llm_count = 0
+    fetch_other_shards = None
+    with applicant_writes(write_buffer, output_path if snapshot_path else None) as writes:
+        if snapshot_path:
+            from snapshot import iter_snapshot
+
+            all_applicants = list(iter_snapshot(snapshot_path))
+        else:
+            # Get applicants with compressed JSON, letting Airtable drop the rest
+            # unless this run has new Compressed JSON that isn't written yet
+            applicants_table = get_table(APPLICANTS_TABLE)
+            formula = None if writes.has_pending("Compressed JSON") else HAS_COMPRESSED_JSON
+            fields = APPLICANT_FIELDS + (EVALUATION_FIELDS if LLM_DUPLICATE_THRESHOLD is not None else [])
+            all_applicants = writes.track(applicants_table.all(fields=fields, formula=shard_formula(shard, formula)))
+            if shard is not None and LLM_DUPLICATE_THRESHOLD is not None:
+                # Evaluations from every shard can be reused, not just this one's. Other
+                # shards' rows are fetched without their Compressed JSON, and only once an
+                # applicant has no match in this shard
+                def fetch_other_shards():
+                    return applicants_table.all(
+                        fields=["Applicant ID"] + EVALUATION_FIELDS,
+                        formula=other_shards_formula(shard, "NOT({LLM Fingerprint} = '')")
+                    )
+
+        duplicate_index = build_duplicate_index(all_applicants)
+        applicants = select_shard(all_applicants, shard)
         
-        # Perform LLM evaluation
-        evaluation = evaluate_applicant_with_llm(applicant['fields'])
+        if not applicants:
+            print("No applicants found to evaluate.")
+            return 0
         
-        # Update applicant record
-        update_applicant_evaluation(applicant['id'], evaluation)
+        scheduled = schedule_evaluations(applicants)
+        print(f"Found {len(applicants)} applicants, {len(scheduled)} scheduled for evaluation.")
         
-        evaluated_count += 1
-        print(f"Completed evaluation for {applicant_id} (Score: {evaluation.get('score', 'N/A')})")
+        # Applicants whose evaluation failed transiently go to the back of the
+        # queue once; anything still failing is left unchanged for the next run.
+        # Applicants without a reusable evaluation are sent LLM_PACK_SIZE per request.
+        queue = deque((applicant, False) for applicant in scheduled)
+        requests_before = llm_usage["requests"]
+        while queue:
+            if (write_buffer is None and LLM_FLUSH_EVERY_RECORDS
+                    and writes.pending_count() >= LLM_FLUSH_EVERY_RECORDS):
+                # Don't hold a long run's results in memory (or lose them to a crash)
+                writes.flush()
+            pack = []
+            while queue and len(pack) < LLM_PACK_SIZE:
+                applicant, requeued = queue.popleft()
+                print(f"Evaluating applicant: {applicant['fields'].get('Applicant ID', 'Unknown')}")
+                tokens, reused = find_reusable_evaluation(applicant, duplicate_index)
+                if not reused and tokens and fetch_other_shards is not None:
+                    build_duplicate_index(fetch_other_shards(), duplicate_index)
+                    fetch_other_shards = None
+                    tokens, reused = find_reusable_evaluation(applicant, duplicate_index)
+                if reused:
+                    save_evaluation(applicant, reused[1], tokens, duplicate_index, writes, reused)
+                    reused_count += 1
+                    evaluated_count += 1
+                elif requeued or budget is None or llm_count < budget:
+                    # A requeued applicant was already counted on its first attempt
+                    llm_count += not requeued
+                    pack.append((applicant, requeued, tokens))
+                else:
+                    over_budget_count += 1
+                    deferred_count += 1
+            if not pack:
+                continue
+            
+            try:
+                results = evaluate_applicants_with_llm([applicant['fields'] for applicant, _, _ in pack])
+            except CircuitOpenError as e:
+                deferred_count += len(pack) + len(queue)
+                print(f"Stopping LLM evaluation: {e}. Deferred {deferred_count} applicants to the next run.")
+                break
+            
+            for (applicant, requeued, tokens), result in zip(pack, results):
+                applicant_id = applicant['fields'].get('Applicant ID', 'Unknown')
+                if not isinstance(result, EvaluationError):
+                    save_evaluation(applicant, result, tokens, duplicate_index, writes)
+                    evaluated_count += 1
+                elif result.transient and not requeued:
+                    print(f"Requeued {applicant_id}: {result}")
+                    queue.append((applicant, True))
+                else:
+                    deferred_count += 1
+                    print(f"Evaluation failed for {applicant_id}, left unchanged for the next run: {result}")
     
-    print(f"\nLLM evaluation complete! Evaluated {evaluated_count} applicants.")
+    if over_budget_count:
+        print(f"LLM budget of {budget} evaluations reached; deferred {over_budget_count} applicants.")
+    print(f"\nLLM evaluation complete! Evaluated {evaluated_count} applicants "
+          f"({reused_count} reused from near-duplicates, {evaluated_count - reused_count} by the LLM "
+          f"in {llm_usage['requests'] - requests_before} requests, {deferred_count} deferred).")
+    return evaluated_count
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+"""Client-side rate limiting for Airtable API requests."""
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+from config import AIRTABLE_REQUESTS_PER_SECOND
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate=AIRTABLE_REQUESTS_PER_SECOND):
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Change the allowed number of calls per second."""
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        with self._lock:
+            self.rate = rate
+            self._interval = 1.0 / rate
+
+    def acquire(self):
+        """Block until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that waits on a RateLimiter before sending each request."""
+
+    def __init__(self, limiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        return super().send(request, **kwargs)
+
+
+# Shared by every table in the process unless a caller passes its own limiter
+airtable_limiter = RateLimiter()
+
+
+def rate_limit_table(table, limiter=None):
+    """Route every request made by a pyairtable Table through `limiter`.
+
+    Defaults to the process-wide `airtable_limiter`. The table's existing retry
+    strategy is kept, so 429 responses are still retried by pyairtable.
+    """
+    limiter = limiter or airtable_limiter
+    session = table.api.session
+    current = session.get_adapter(table.api.endpoint_url)
+    adapter = RateLimitedAdapter(limiter, max_retries=current.max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return table
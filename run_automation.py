@@ -1,10 +1,30 @@
 """Main script to run all automation steps in sequence."""
+import importlib
 import sys
-import time
-from compress_json import compress_all_applicants
-from decompress_json import decompress_all_applicants
-from shortlist_leads import shortlist_candidates
-from llm_evaluation import evaluate_all_applicants
+
+# Step name -> (module, function, header). Step modules are imported only when
+# the step runs, so e.g. `compress` never loads the OpenAI/LangSmith SDKs.
+STEPS = {
+    "compress": ("compress_json", "compress_all_applicants", "Running JSON Compression"),
+    "decompress": ("decompress_json", "decompress_all_applicants", "Running JSON Decompression"),
+    "shortlist": ("shortlist_leads", "shortlist_candidates", "Running Lead Shortlisting"),
+    "evaluate": ("llm_evaluation", "evaluate_all_applicants", "Running LLM Evaluation"),
+    "watch": ("watch_service", "run_watch_service", "Running Watch Service"),
+    "shards": ("sharding", "run_sharded", "Running Sharded Pipeline"),
+    "worker": ("sharding", "run_worker", "Running Shard Worker"),
+    "shard-status": ("sharding", "summarize", "Shard Progress"),
+    "export": ("snapshot", "export_snapshot", "Exporting Applicants Snapshot"),
+    "replay": ("snapshot", "run_replay", "Replaying Snapshot Offline"),
+}
+
+# Steps that take command-line arguments (file paths) -> how many at most
+STEP_ARGUMENTS = {"export": 1, "replay": 2}
+
+
+def load_step(step):
+    """Import a step's module and return its entry point function."""
+    module_name, function_name, _ = STEPS[step]
+    return getattr(importlib.import_module(module_name), function_name)
 
 
 def print_header(text):
@@ -15,23 +35,33 @@ def print_header(text):
 
 
 def run_full_automation():
-    """Run the complete automation pipeline."""
+    """Run the complete automation pipeline.
+
+    All stages share one write buffer, so each applicant row gets a single
+    PATCH with its compressed JSON, shortlist status and LLM evaluation.
+    """
     print_header("AIRTABLE AUTOMATION PIPELINE")
     
     try:
-        # Step 1: Compress JSON
-        print_header("Step 1: JSON Compression")
-        compress_all_applicants()
-        time.sleep(2)  # Brief pause between steps
-        
-        # Step 2: Shortlist candidates
-        print_header("Step 2: Lead Shortlisting")
-        shortlist_candidates()
-        time.sleep(2)
-        
-        # Step 3: LLM evaluation
-        print_header("Step 3: LLM Evaluation")
-        evaluate_all_applicants()
+        from write_buffer import ApplicantWriteBuffer
+
+        write_buffer = ApplicantWriteBuffer()
+        try:
+            # Step 1: Compress JSON
+            print_header("Step 1: JSON Compression")
+            load_step("compress")(write_buffer)
+            
+            # Step 2: Shortlist candidates
+            print_header("Step 2: Lead Shortlisting")
+            load_step("shortlist")(write_buffer)
+            
+            # Step 3: LLM evaluation
+            print_header("Step 3: LLM Evaluation")
+            load_step("evaluate")(write_buffer)
+        finally:
+            # Keep whatever earlier stages produced even if a later one fails
+            print_header("Writing Applicant Updates")
+            write_buffer.flush()
         
         print_header("AUTOMATION COMPLETE")
         print("All steps completed successfully!")
@@ -41,31 +71,25 @@ def run_full_automation():
         sys.exit(1)
 
 
-def run_single_step(step):
-    """Run a single automation step."""
-    if step == "compress":
-        print_header("Running JSON Compression")
-        compress_all_applicants()
-    elif step == "decompress":
-        print_header("Running JSON Decompression")
-        decompress_all_applicants()
-    elif step == "shortlist":
-        print_header("Running Lead Shortlisting")
-        shortlist_candidates()
-    elif step == "evaluate":
-        print_header("Running LLM Evaluation")
-        evaluate_all_applicants()
-    else:
+def run_single_step(step, args=()):
+    """Run a single automation step, passing extra command-line arguments to steps that take them."""
+    if step not in STEPS:
         print(f"Unknown step: {step}")
-        print("Valid steps: compress, decompress, shortlist, evaluate")
+        print(f"Valid steps: {', '.join(STEPS)}")
         sys.exit(1)
+    if len(args) > STEP_ARGUMENTS.get(step, 0):
+        print(f"Too many arguments for {step}: {' '.join(args)}")
+        sys.exit(1)
+
+    print_header(STEPS[step][2])
+    load_step(step)(*args)
 
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         # Run specific step
         step = sys.argv[1].lower()
-        run_single_step(step)
+        run_single_step(step, sys.argv[2:])
     else:
         # Run full automation
         run_full_automation()
@@ -1,158 +1,427 @@
-"""Script to create sample data in Airtable for testing."""
+"""Script to create sample data in Airtable for testing.
+
+Besides the three hand-written applicants, `generate_applicants` produces any
+number of realistic applicants deterministically from a seed, which can be
+written to Airtable in rate-limited batches or exported to local files for
+load testing and benchmarking.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import random
+from datetime import date, datetime, timedelta
 from pyairtable import Table
+import config
 from config import (
-    AIRTABLE_API_KEY, AIRTABLE_BASE_ID,
     APPLICANTS_TABLE, PERSONAL_DETAILS_TABLE,
     WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE
 )
+from rate_limit import rate_limit_table
 
 
-def get_table(table_name):
-    """Get Airtable table instance."""
-    return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
-
-
-def create_sample_applicants():
-    """Create sample applicant data for testing."""
-    
-    # Sample applicants data
-    applicants_data = [
-        {
-            "id": "APP001",
-            "personal": {
-                "name": "John Smith",
-                "email": "john.smith@email.com",
-                "location": "San Francisco, USA",
-                "linkedin": "https://linkedin.com/in/johnsmith"
+SAMPLE_APPLICANTS = [
+    {
+        "id": "APP001",
+        "personal": {
+            "name": "John Smith",
+            "email": "john.smith@email.com",
+            "location": "San Francisco, USA",
+            "linkedin": "https://linkedin.com/in/johnsmith"
+        },
+        "experience": [
+            {
+                "company": "Google",
+                "title": "Senior Software Engineer",
+                "start": "2019-03-01",
+                "end": "2022-08-31",
+                "technologies": "Python, Go, Kubernetes"
             },
-            "experience": [
-                {
-                    "company": "Google",
-                    "title": "Senior Software Engineer",
-                    "start": "2019-03-01",
-                    "end": "2022-08-31",
-                    "technologies": "Python, Go, Kubernetes"
-                },
-                {
-                    "company": "Startup Inc",
-                    "title": "Software Engineer",
-                    "start": "2017-06-01",
-                    "end": "2019-02-28",
-                    "technologies": "JavaScript, React, Node.js"
-                }
-            ],
-            "salary": {
-                "rate": 95,
-                "minimum_rate": 85,
-                "currency": "USD",
-                "availability": 25
+            {
+                "company": "Startup Inc",
+                "title": "Software Engineer",
+                "start": "2017-06-01",
+                "end": "2019-02-28",
+                "technologies": "JavaScript, React, Node.js"
             }
+        ],
+        "salary": {
+            "rate": 95,
+            "minimum_rate": 85,
+            "currency": "USD",
+            "availability": 25
+        }
+    },
+    {
+        "id": "APP002",
+        "personal": {
+            "name": "Sarah Johnson",
+            "email": "sarah.j@email.com",
+            "location": "London, UK",
+            "linkedin": "https://linkedin.com/in/sarahjohnson"
         },
-        {
-            "id": "APP002",
-            "personal": {
-                "name": "Sarah Johnson",
-                "email": "sarah.j@email.com",
-                "location": "London, UK",
-                "linkedin": "https://linkedin.com/in/sarahjohnson"
-            },
-            "experience": [
-                {
-                    "company": "Small Tech Co",
-                    "title": "Junior Developer",
-                    "start": "2021-01-15",
-                    "end": "2023-12-31",
-                    "technologies": "Python, Django"
-                }
-            ],
-            "salary": {
-                "rate": 120,
-                "minimum_rate": 110,
-                "currency": "USD",
-                "availability": 40
+        "experience": [
+            {
+                "company": "Small Tech Co",
+                "title": "Junior Developer",
+                "start": "2021-01-15",
+                "end": "2023-12-31",
+                "technologies": "Python, Django"
             }
+        ],
+        "salary": {
+            "rate": 120,
+            "minimum_rate": 110,
+            "currency": "USD",
+            "availability": 40
+        }
+    },
+    {
+        "id": "APP003",
+        "personal": {
+            "name": "Raj Patel",
+            "email": "raj.patel@email.com",
+            "location": "Mumbai, India",
+            "linkedin": "https://linkedin.com/in/rajpatel"
         },
-        {
-            "id": "APP003",
-            "personal": {
-                "name": "Raj Patel",
-                "email": "raj.patel@email.com",
-                "location": "Mumbai, India",
-                "linkedin": "https://linkedin.com/in/rajpatel"
-            },
-            "experience": [
-                {
-                    "company": "Meta",
-                    "title": "Staff Engineer",
-                    "start": "2020-07-01",
-                    "end": "",
-                    "technologies": "React, GraphQL, Python"
-                }
-            ],
-            "salary": {
-                "rate": 80,
-                "minimum_rate": 70,
-                "currency": "USD",
-                "availability": 30
+        "experience": [
+            {
+                "company": "Meta",
+                "title": "Staff Engineer",
+                "start": "2020-07-01",
+                "end": "",
+                "technologies": "React, GraphQL, Python"
             }
+        ],
+        "salary": {
+            "rate": 80,
+            "minimum_rate": 70,
+            "currency": "USD",
+            "availability": 30
         }
-    ]
-    
-    # Get table instances
-    applicants_table = get_table(APPLICANTS_TABLE)
-    personal_table = get_table(PERSONAL_DETAILS_TABLE)
-    experience_table = get_table(WORK_EXPERIENCE_TABLE)
-    salary_table = get_table(SALARY_PREFERENCES_TABLE)
-    
-    for applicant_data in applicants_data:
-        print(f"Creating applicant: {applicant_data['id']}")
-        
-        # Create parent applicant record
-        applicant_record = applicants_table.create({
-            "Applicant ID": applicant_data["id"]
-        })
-        
-        # Create personal details
-        personal_table.create({
-            "Applicant ID": [applicant_record['id']],
-            "Full Name": applicant_data["personal"]["name"],
-            "Email": applicant_data["personal"]["email"],
-            "Location": applicant_data["personal"]["location"],
-            "LinkedIn": applicant_data["personal"]["linkedin"]
+    }
+]
+
+
+# Generator settings. Weights are relative, not percentages.
+REFERENCE_DATE = date(2024, 6, 1)  # Fixed "today" so output depends only on the seed
+
+COMPANY_POOLS = [
+    (["Google", "Google LLC", "Meta", "Meta Platforms", "OpenAI", "Microsoft",
+      "Amazon", "Amazon Web Services", "Apple", "Netflix"], 15),
+    (["Stripe", "Shopify", "Atlassian", "Salesforce", "Uber", "Airbnb",
+      "Spotify", "Adobe", "Datadog", "Twilio"], 35),
+    (["Startup Inc", "Small Tech Co", "Acme Labs", "Pixel Forge", "DataNest",
+      "Cloudbridge", "Northwind Software", "Bright Apps", "Quantum Widgets",
+      "Bluefin Analytics"], 50),
+]
+
+# (city, country as an applicant might type it, local currency, weight)
+LOCATIONS = [
+    ("San Francisco", "USA", "USD", 10),
+    ("New York", "United States", "USD", 10),
+    ("Austin", "US", "USD", 5),
+    ("Toronto", "Canada", "CAD", 7),
+    ("London", "UK", "GBP", 7),
+    ("Manchester", "United Kingdom", "GBP", 3),
+    ("Berlin", "Germany", "EUR", 6),
+    ("Mumbai", "India", "INR", 9),
+    ("Bangalore", "India", "INR", 9),
+    ("Sao Paulo", "Brazil", "BRL", 8),
+    ("Lagos", "Nigeria", "NGN", 6),
+    ("Manila", "Philippines", "PHP", 6),
+    ("Warsaw", "Poland", "PLN", 7),
+    ("Sydney", "Australia", "AUD", 7),
+]
+
+DATE_FORMATS = [("%Y-%m-%d", 70), ("%m/%d/%Y", 20), ("%d/%m/%Y", 10)]
+
+AVAILABILITY_HOURS = [(10, 10), (15, 10), (20, 20), (25, 15), (30, 15), (35, 10), (40, 20)]
+
+TITLES = [
+    "Software Engineer", "Senior Software Engineer", "Staff Engineer",
+    "Junior Developer", "Backend Engineer", "Frontend Engineer",
+    "Data Engineer", "Machine Learning Engineer", "DevOps Engineer",
+    "Engineering Manager",
+]
+
+TECHNOLOGIES = [
+    "Python", "Go", "Java", "JavaScript", "TypeScript", "React", "Node.js",
+    "Django", "Kubernetes", "AWS", "GCP", "PostgreSQL", "GraphQL", "Rust",
+    "Terraform", "Spark", "PyTorch",
+]
+
+FIRST_NAMES = [
+    "John", "Sarah", "Raj", "Maria", "Wei", "Amara", "Lukas", "Priya",
+    "Diego", "Hannah", "Kenji", "Fatima", "Oliver", "Chloe", "Mateus", "Zofia",
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Patel", "Garcia", "Chen", "Okafor", "Muller", "Sharma",
+    "Silva", "Brown", "Tanaka", "Khan", "Wilson", "Martin", "Santos", "Nowak",
+]
+
+
+def _weighted(pairs):
+    """Split (value, weight) pairs into values and cumulative weights."""
+    values, cum_weights, total = [], [], 0
+    for value, weight in pairs:
+        total += weight
+        values.append(value)
+        cum_weights.append(total)
+    return values, cum_weights
+
+
+_COMPANY_POOLS = _weighted(COMPANY_POOLS)
+_LOCATIONS = _weighted([(loc[:3], loc[3]) for loc in LOCATIONS])
+_DATE_FORMATS = _weighted(DATE_FORMATS)
+_AVAILABILITY = _weighted(AVAILABILITY_HOURS)
+
+
+def _pick(rng, weighted):
+    values, cum_weights = weighted
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def generate_experience(rng):
+    """Generate 1-4 jobs, most recent first, walking back from REFERENCE_DATE."""
+    experience = []
+    end = REFERENCE_DATE - timedelta(days=rng.randint(0, 120))
+    current_role = rng.random() < 0.4
+    for index in range(rng.randint(1, 4)):
+        start = end - timedelta(days=rng.randint(180, 1800))
+        date_format = _pick(rng, _DATE_FORMATS)
+        experience.append({
+            "company": rng.choice(_pick(rng, _COMPANY_POOLS)),
+            "title": rng.choice(TITLES),
+            "start": start.strftime(date_format),
+            "end": "" if index == 0 and current_role else end.strftime(date_format),
+            "technologies": ", ".join(rng.sample(TECHNOLOGIES, rng.randint(2, 4))),
         })
-        
-        # Create work experience records
-        for exp in applicant_data["experience"]:
-            experience_table.create({
-                "Applicant ID": [applicant_record['id']],
+        end = start - timedelta(days=rng.randint(0, 180))
+    return experience
+
+
+def generate_applicant(rng, applicant_id):
+    """Generate a single applicant in the same shape as SAMPLE_APPLICANTS."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city, country, local_currency = _pick(rng, _LOCATIONS)
+    handle = f"{first}.{last}{rng.randint(1, 999)}".lower()
+
+    # Log-normal rates: most applicants cluster around $60-90/hr with a long tail
+    rate = min(300, max(15, round(rng.lognormvariate(math.log(75), 0.45))))
+    submitted = datetime.combine(REFERENCE_DATE, datetime.min.time()) - timedelta(
+        seconds=rng.randint(0, 365 * 24 * 3600)
+    )
+
+    return {
+        "id": applicant_id,
+        "created_time": submitted.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "personal": {
+            "name": f"{first} {last}",
+            "email": f"{handle}@email.com",
+            "location": f"{city}, {country}",
+            "linkedin": f"https://linkedin.com/in/{handle.replace('.', '')}"
+        },
+        "experience": generate_experience(rng),
+        "salary": {
+            "rate": rate,
+            "minimum_rate": max(10, rate - rng.randint(0, rate // 5)),
+            "currency": local_currency if rng.random() < 0.3 else "USD",
+            "availability": _pick(rng, _AVAILABILITY)
+        }
+    }
+
+
+def generate_applicants(count, seed=0, id_prefix="GEN"):
+    """Yield `count` synthetic applicants; the same seed yields the same data."""
+    rng = random.Random(seed)
+    for index in range(1, count + 1):
+        yield generate_applicant(rng, f"{id_prefix}{index:06d}")
+
+
+def get_table(table_name):
+    """Get Airtable table instance."""
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
+
+
+def child_records(applicant_data, applicant_record_id):
+    """Build the child table rows for an applicant, keyed by table name."""
+    personal = applicant_data["personal"]
+    salary = applicant_data["salary"]
+    return {
+        PERSONAL_DETAILS_TABLE: [{
+            "Applicant ID": [applicant_record_id],
+            "Full Name": personal["name"],
+            "Email": personal["email"],
+            "Location": personal["location"],
+            "LinkedIn": personal["linkedin"]
+        }],
+        WORK_EXPERIENCE_TABLE: [
+            {
+                "Applicant ID": [applicant_record_id],
                 "Company": exp["company"],
                 "Title": exp["title"],
                 "Start": exp["start"],
                 "End": exp["end"] if exp["end"] else None,
                 "Technologies": exp["technologies"]
-            })
-        
-        # Create salary preferences
-        salary_table.create({
-            "Applicant ID": [applicant_record['id']],
-            "Preferred Rate": applicant_data["salary"]["rate"],
-            "Minimum Rate": applicant_data["salary"]["minimum_rate"],
-            "Currency": applicant_data["salary"]["currency"],
-            "Availability (hrs/wk)": applicant_data["salary"]["availability"]
-        })
-        
-        print(f"Created all records for {applicant_data['id']}")
+            }
+            for exp in applicant_data["experience"]
+        ],
+        SALARY_PREFERENCES_TABLE: [{
+            "Applicant ID": [applicant_record_id],
+            "Preferred Rate": salary["rate"],
+            "Minimum Rate": salary["minimum_rate"],
+            "Currency": salary["currency"],
+            "Availability (hrs/wk)": salary["availability"]
+        }],
+    }
+
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_applicants_to_airtable(applicants, chunk_size=50):
+    """Create applicants and their child records with rate-limited batch_create.
+
+    Applicants are written `chunk_size` at a time: parents first so their record
+    IDs can be linked, then every child row of the chunk in 10-record batches.
+    All requests go through the process-wide Airtable rate limiter.
+    """
+    applicants_table = get_table(APPLICANTS_TABLE)
+    child_tables = {
+        name: get_table(name)
+        for name in (PERSONAL_DETAILS_TABLE, WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE)
+    }
+
+    created = 0
+    for chunk in _chunked(applicants, chunk_size):
+        parents = applicants_table.batch_create(
+            [{"Applicant ID": applicant_data["id"]} for applicant_data in chunk]
+        )
+
+        rows = {name: [] for name in child_tables}
+        for applicant_data, parent in zip(chunk, parents):
+            for name, records in child_records(applicant_data, parent['id']).items():
+                rows[name].extend(records)
+        for name, records in rows.items():
+            child_tables[name].batch_create(records)
+
+        created += len(chunk)
+        print(f"Created {created} applicants (last: {chunk[-1]['id']})")
+
+    return created
+
+
+def _open_output(path):
+    """Open a text file for writing, gzip-compressed if the path ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", compresslevel=6, encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def export_ndjson(applicants, path):
+    """Write applicants to an NDJSON file, one nested applicant per line."""
+    count = 0
+    with _open_output(path) as output:
+        for applicant_data in applicants:
+            output.write(json.dumps(applicant_data, separators=(",", ":")) + "\n")
+            count += 1
+    print(f"Wrote {count} applicants to {path}")
+    return count
+
+
+def _mirror_record_id(table_name, key):
+    """Deterministic Airtable-style record ID for the local mirror."""
+    digest = hashlib.sha1(f"{table_name}:{key}".encode()).hexdigest()
+    return "rec" + digest[:14]
+
+
+def export_local_mirror(applicants, path):
+    """Write applicants as Airtable-shaped records for a local mirror of the base.
+
+    Each line is one record, as returned by `Table.all()`, plus the name of the
+    table it belongs to: {"table", "id", "createdTime", "fields"}.
+    """
+    count = 0
+    with _open_output(path) as output:
+        for applicant_data in applicants:
+            created_time = applicant_data.get(
+                "created_time", f"{REFERENCE_DATE.isoformat()}T00:00:00.000Z"
+            )
+            applicant_record_id = _mirror_record_id(APPLICANTS_TABLE, applicant_data["id"])
+            records = [(APPLICANTS_TABLE, applicant_record_id, {"Applicant ID": applicant_data["id"]})]
+            for name, rows in child_records(applicant_data, applicant_record_id).items():
+                for index, fields in enumerate(rows):
+                    record_id = _mirror_record_id(name, f"{applicant_data['id']}:{index}")
+                    records.append((name, record_id, fields))
+
+            for name, record_id, fields in records:
+                output.write(json.dumps({
+                    "table": name,
+                    "id": record_id,
+                    "createdTime": created_time,
+                    "fields": fields
+                }, separators=(",", ":")) + "\n")
+            count += 1
+    print(f"Wrote {count} applicants to local mirror {path}")
+    return count
+
+
+def create_sample_applicants():
+    """Create sample applicant data for testing."""
+    write_applicants_to_airtable(SAMPLE_APPLICANTS)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int,
+                        help="Generate this many synthetic applicants instead of the 3 samples")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for generated data")
+    parser.add_argument("--id-prefix", default="GEN", help="Applicant ID prefix for generated data")
+    parser.add_argument("--ndjson", help="Export applicants to this NDJSON file (.gz to compress)")
+    parser.add_argument("--mirror", help="Export Airtable-shaped records to this local mirror file")
+    parser.add_argument("--airtable", action="store_true",
+                        help="Write generated applicants to Airtable")
+    parser.add_argument("--yes", action="store_true",
+                        help="Do not ask for confirmation before creating the 3 samples")
+    args = parser.parse_args()
+    if args.count is not None and not (args.ndjson or args.mirror or args.airtable):
+        parser.error("--count needs a destination: --ndjson, --mirror and/or --airtable")
+    return args
 
 
 if __name__ == "__main__":
-    print("Creating sample data in Airtable...")
-    print("WARNING: This will create new records. Continue? (y/n)")
-    
-    response = input().lower()
-    if response == 'y':
-        create_sample_applicants()
+    args = parse_args()
+
+    def applicants():
+        if args.count is None:
+            return iter(SAMPLE_APPLICANTS)
+        return generate_applicants(args.count, seed=args.seed, id_prefix=args.id_prefix)
+
+    if args.ndjson:
+        export_ndjson(applicants(), args.ndjson)
+    if args.mirror:
+        export_local_mirror(applicants(), args.mirror)
+
+    write_airtable = args.airtable or (args.count is None and not (args.ndjson or args.mirror))
+    if write_airtable:
+        print("Creating sample data in Airtable...")
+        # Generated data is only written with an explicit --airtable, so only the default mode asks
+        if args.count is None and not args.yes:
+            print("WARNING: This will create new records. Continue? (y/n)")
+            if input().lower() != 'y':
+                print("Operation cancelled.")
+                raise SystemExit(0)
+        write_applicants_to_airtable(applicants())
         print("\nSample data created successfully!")
         print("You can now run the automation scripts to test the system.")
-    else:
-        print("Operation cancelled.")
-
@@ -0,0 +1,364 @@
+"""Sharded pipeline execution across worker processes and hosts.
+
+Applicants are partitioned into SHARD_COUNT shards by a stable hash of their
+Applicant ID. Compress stores that hash in the Applicants "Shard Key" field
+(and shortlisting in Shortlisted Leads), so each stage asks Airtable for
+its shard's rows only; rows without a key yet are fetched by every shard and
+sorted out locally. Workers claim shards from a SQLite lease table, keep their
+leases alive with heartbeats, and run compress -> shortlist -> evaluate for
+each claimed shard. A shard whose worker stops heartbeating is reclaimed by
+another worker once its lease expires.
+
+Workers on several hosts can share the lease database through a shared
+filesystem that supports SQLite locking. The Airtable rate budget
+(AIRTABLE_REQUESTS_PER_SECOND per base) is split evenly between the workers
+that are currently heartbeating.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config import (
+    AIRTABLE_REQUESTS_PER_SECOND, LLM_MAX_EVALUATIONS_PER_RUN,
+    SHARD_COUNT, SHARD_WORKERS, SHARD_LEASE_DB, SHARD_LEASE_SECONDS, SHARD_MAX_ATTEMPTS
+)
+
+
+# Number field holding shard_key(Applicant ID), in Applicants and Shortlisted Leads
+SHARD_KEY_FIELD = "Shard Key"
+
+
+def shard_key(applicant_id):
+    """Stable 32-bit hash of an Applicant ID (independent of process and host)."""
+    digest = hashlib.sha1(str(applicant_id).encode()).hexdigest()
+    return int(digest[:8], 16)
+
+
+def shard_for(applicant_id, shard_count):
+    """Stable shard index for an Applicant ID."""
+    return shard_key(applicant_id) % shard_count
+
+
+def shard_formula(shard=None, formula=None):
+    """Airtable `formula` narrowed to rows that may be in `shard`; None matches every row.
+
+    Rows whose Shard Key isn't written yet are included, so callers still
+    apply select_shard to the result.
+    """
+    if shard is None:
+        return formula
+    return f"AND({formula}, {_in_shard(shard)})" if formula else _in_shard(shard)
+
+
+def other_shards_formula(shard, formula):
+    """Airtable `formula` narrowed to rows with a Shard Key outside `shard`.
+
+    Together with shard_formula(shard) it covers every row exactly once.
+    """
+    return f"AND({formula}, NOT({_in_shard(shard)}))"
+
+
+def _in_shard(shard):
+    index, count = shard
+    return f"OR({{{SHARD_KEY_FIELD}}} = BLANK(), MOD({{{SHARD_KEY_FIELD}}}, {count}) = {index})"
+
+
+def select_shard(records, shard=None):
+    """Keep the Applicants records in `shard`, an (index, count) pair; None keeps all."""
+    if shard is None:
+        return records
+    index, count = shard
+    return [
+        record for record in records
+        if shard_for(record['fields'].get('Applicant ID', record['id']), count) == index
+    ]
+
+
+class LeaseStore:
+    """SQLite-backed shard leases, worker heartbeats and per-shard metrics."""
+
+    def __init__(self, path=SHARD_LEASE_DB, lease_seconds=SHARD_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard_index INTEGER PRIMARY KEY,
+                    shard_count INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL,
+                    finished_at REAL,
+                    metrics TEXT,
+                    error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    heartbeat REAL NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # isolation_level=None: transactions are managed explicitly with BEGIN IMMEDIATE,
+        # and closing without COMMIT rolls back
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def init_run(self, shard_count=SHARD_COUNT):
+        """Create the shard rows for a new run, discarding any previous run (coordinator only)."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM shards")
+            db.execute("DELETE FROM workers")
+            db.executemany(
+                "INSERT INTO shards (shard_index, shard_count) VALUES (?, ?)",
+                [(index, shard_count) for index in range(shard_count)]
+            )
+            db.execute("COMMIT")
+
+    def run_shard_counts(self):
+        """Shard counts of the current run's rows (one value for a well-formed run)."""
+        with self._connect() as db:
+            return [row[0] for row in db.execute("SELECT DISTINCT shard_count FROM shards")]
+
+    def claim(self, worker_id):
+        """Claim a pending shard or one whose lease expired; return (index, count) or None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                """SELECT shard_index, shard_count FROM shards
+                   WHERE attempts < ? AND (status = 'pending'
+                         OR (status = 'running' AND lease_expires < ?))
+                   ORDER BY status = 'running', shard_index LIMIT 1""",
+                (SHARD_MAX_ATTEMPTS, now)
+            ).fetchone()
+            if row:
+                db.execute(
+                    """UPDATE shards SET status = 'running', owner = ?, lease_expires = ?,
+                              attempts = attempts + 1, started_at = ?, error = NULL
+                       WHERE shard_index = ?""",
+                    (worker_id, now + self.lease_seconds, now, row[0])
+                )
+            db.execute("COMMIT")
+        return tuple(row) if row else None
+
+    def heartbeat(self, worker_id, shard_index=None):
+        """Record that a worker is alive and extend its lease on `shard_index`."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, heartbeat) VALUES (?, ?)",
+                (worker_id, now)
+            )
+            if shard_index is not None:
+                db.execute(
+                    "UPDATE shards SET lease_expires = ? WHERE shard_index = ? AND owner = ?",
+                    (now + self.lease_seconds, shard_index, worker_id)
+                )
+
+    def leave(self, worker_id):
+        """Remove a worker so the others get its share of the rate budget."""
+        with self._connect() as db:
+            db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def active_workers(self):
+        """Number of workers that heartbeated within the lease period."""
+        with self._connect() as db:
+            (count,) = db.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?",
+                (time.time() - self.lease_seconds,)
+            ).fetchone()
+        return count
+
+    def finish(self, shard_index, worker_id, metrics=None, error=None):
+        """Mark a shard done (or back to pending after an error) if we still own it."""
+        status = "pending" if error else "done"
+        with self._connect() as db:
+            db.execute(
+                """UPDATE shards SET status = ?, lease_expires = NULL, finished_at = ?,
+                          metrics = ?, error = ?
+                   WHERE shard_index = ? AND owner = ?""",
+                (status, time.time(), json.dumps(metrics or {}), error, shard_index, worker_id)
+            )
+
+    def progress(self):
+        """Return one dict per shard with its status, owner and metrics."""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute("SELECT * FROM shards ORDER BY shard_index").fetchall()
+        shards = []
+        for row in rows:
+            shard = dict(row)
+            shard["metrics"] = json.loads(shard["metrics"]) if shard["metrics"] else {}
+            shards.append(shard)
+        return shards
+
+
+def shard_budget(budget, shard):
+    """A shard's share of the per-run LLM budget (None for no limit); the shares add up to `budget`."""
+    if budget is None:
+        return None
+    index, count = shard
+    return budget // count + (index < budget % count)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_shard(shard):
+    """Run compress -> shortlist -> evaluate for one shard; return its metrics."""
+    from compress_json import compress_all_applicants
+    from shortlist_leads import shortlist_candidates
+    from llm_evaluation import evaluate_all_applicants
+    from write_buffer import ApplicantWriteBuffer
+
+    started = time.time()
+    write_buffer = ApplicantWriteBuffer()
+    try:
+        compressed = compress_all_applicants(write_buffer, shard=shard)
+        shortlisted = shortlist_candidates(write_buffer, shard=shard)
+        evaluated = evaluate_all_applicants(
+            write_buffer, shard=shard, budget=shard_budget(LLM_MAX_EVALUATIONS_PER_RUN, shard)
+        )
+    finally:
+        written = write_buffer.flush()
+
+    return {
+        "applicants": compressed,
+        "shortlisted": shortlisted,
+        "evaluated": evaluated,
+        "records_written": written,
+        "seconds": round(time.time() - started, 1),
+    }
+
+
+def run_worker(worker_id=None, lease_path=SHARD_LEASE_DB, shard_count=SHARD_COUNT):
+    """Claim and process shards until none are left to claim.
+
+    Workers only join a run the coordinator (`run_sharded`) created; they
+    never create or reset one. RuntimeError is raised if there is no run in
+    `lease_path` or it uses a different shard count.
+    """
+    from rate_limit import airtable_limiter
+
+    worker_id = worker_id or default_worker_id()
+    store = LeaseStore(lease_path)
+    counts = store.run_shard_counts()
+    if not counts:
+        raise RuntimeError(f"No shard run in {lease_path}; start one with `run_automation.py shards`")
+    if counts != [shard_count]:
+        raise RuntimeError(f"The run in {lease_path} uses {', '.join(map(str, counts))} shards, "
+                           f"not {shard_count}; check SHARD_COUNT on this host")
+
+    current = {"shard": None}
+    stop = threading.Event()
+
+    def keep_alive():
+        # Renew the lease and re-divide the rate budget among live workers
+        while not stop.wait(store.lease_seconds / 3):
+            try:
+                store.heartbeat(worker_id, current["shard"])
+                workers = max(1, store.active_workers())
+                airtable_limiter.set_rate(AIRTABLE_REQUESTS_PER_SECOND / workers)
+            except sqlite3.Error as e:
+                print(f"[{worker_id}] Heartbeat failed: {e}")
+
+    store.heartbeat(worker_id)
+    airtable_limiter.set_rate(AIRTABLE_REQUESTS_PER_SECOND / max(1, store.active_workers()))
+    threading.Thread(target=keep_alive, daemon=True).start()
+
+    processed = 0
+    try:
+        while True:
+            claimed = store.claim(worker_id)
+            if claimed is None:
+                break
+
+            current["shard"] = claimed[0]
+            print(f"[{worker_id}] Claimed shard {claimed[0] + 1}/{claimed[1]}")
+            try:
+                metrics = run_shard(claimed)
+            except Exception as e:
+                print(f"[{worker_id}] Shard {claimed[0]} failed: {e}")
+                store.finish(claimed[0], worker_id, error=str(e))
+            else:
+                metrics["worker"] = worker_id
+                store.finish(claimed[0], worker_id, metrics)
+                processed += 1
+            current["shard"] = None
+    finally:
+        stop.set()
+        store.leave(worker_id)
+
+    print(f"[{worker_id}] No shards left to claim; processed {processed}.")
+    return processed
+
+
+def summarize(lease_path=SHARD_LEASE_DB):
+    """Merge per-shard progress and metrics into run totals and print them."""
+    shards = LeaseStore(lease_path).progress()
+    totals = {}
+    by_status = {}
+    for shard in shards:
+        by_status[shard["status"]] = by_status.get(shard["status"], 0) + 1
+        for name, value in shard["metrics"].items():
+            if isinstance(value, (int, float)) and name != "seconds":
+                totals[name] = totals.get(name, 0) + value
+
+    for shard in shards:
+        metrics = shard["metrics"]
+        line = f"Shard {shard['shard_index']:>3}: {shard['status']:<8} attempts={shard['attempts']}"
+        if metrics:
+            line += (f" applicants={metrics.get('applicants', 0)} shortlisted={metrics.get('shortlisted', 0)}"
+                     f" evaluated={metrics.get('evaluated', 0)} {metrics.get('seconds', 0)}s"
+                     f" ({metrics.get('worker', shard['owner'])})")
+        if shard["error"]:
+            line += f" error: {shard['error']}"
+        print(line)
+
+    print("\nShards: " + ", ".join(f"{count} {status}" for status, count in sorted(by_status.items())))
+    print("Totals: " + ", ".join(f"{name}={value}" for name, value in sorted(totals.items())))
+    return totals
+
+
+def run_sharded(workers=SHARD_WORKERS, shard_count=SHARD_COUNT, lease_path=SHARD_LEASE_DB):
+    """Coordinator: start a fresh run, spawn local workers, then report merged metrics.
+
+    Workers on other hosts can join the same run with `run_automation.py worker`.
+    """
+    import multiprocessing
+
+    LeaseStore(lease_path).init_run(shard_count)
+    print(f"Running {shard_count} shards with {workers} local workers (leases in {lease_path})")
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            kwargs={"worker_id": f"{default_worker_id()}-w{index}",
+                    "lease_path": lease_path, "shard_count": shard_count}
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    print()
+    totals = summarize(lease_path)
+    unfinished = [shard for shard in LeaseStore(lease_path).progress() if shard["status"] != "done"]
+    if unfinished:
+        raise RuntimeError(f"{len(unfinished)} shards did not finish")
+    return totals
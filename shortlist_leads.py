@@ -1,20 +1,46 @@
 """Script to auto-shortlist promising candidates based on defined rules."""
 import json
+import re
 from datetime import datetime
+from functools import lru_cache
 from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
 from config import (
-    AIRTABLE_API_KEY, AIRTABLE_BASE_ID,
     APPLICANTS_TABLE, SHORTLISTED_LEADS_TABLE,
     TIER_1_COMPANIES, ELIGIBLE_COUNTRIES,
-    MIN_EXPERIENCE_YEARS, MAX_HOURLY_RATE, MIN_AVAILABILITY_HOURS
+    MIN_EXPERIENCE_YEARS, MAX_HOURLY_RATE, MIN_AVAILABILITY_HOURS,
+    REPLAY_OUTPUT_PATH
 )
+from countries import COUNTRY_ALIASES, COUNTRY_NAMES
+from sharding import SHARD_KEY_FIELD, select_shard, shard_formula, shard_key
+from write_buffer import applicant_writes
+
+# Applicants fields this stage reads, and a server-side filter for rows it can use
+APPLICANT_FIELDS = ["Applicant ID", "Compressed JSON", "Shortlist Status"]
+HAS_COMPRESSED_JSON = "NOT({Compressed JSON} = '')"
+
+# Fields compress derives from Compressed JSON so Airtable can prefilter shortlisting
+DERIVED_FIELDS = [
+    "Total Experience Years", "Has Current Job", "Has Tier-1 Experience", "Country",
+    "Preferred Rate", "Availability (hrs/wk)",
+]
+# Days added to the experience top-up so rounding never excludes a row that passes
+PREFILTER_SLACK_DAYS = 3
+# Fields whose unwritten changes make the prefilter unreliable (stale experience
+# years are allowed for in the formula)
+PREFILTER_INPUTS = ["Compressed JSON"] + DERIVED_FIELDS[1:]
+
+
+CRITERIA_COUNT = 3  # experience, compensation, location
 
 
 def get_table(table_name):
     """Get Airtable table instance."""
-    return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
 
 
+@lru_cache(maxsize=65536)  # Dates repeat across applicants and runs
 def parse_date(date_str):
     """Parse date string to datetime object."""
     if not date_str:
@@ -44,6 +70,11 @@ def calculate_total_experience(experience_list):
     return total_days / 365.25  # Convert to years
 
 
+def has_current_job(experience_list):
+    """Whether any job is open-ended, so experience keeps growing after it is calculated."""
+    return any(parse_date(exp.get("start")) and not parse_date(exp.get("end")) for exp in experience_list)
+
+
 def has_tier1_experience(experience_list):
     """Check if candidate has worked at a Tier-1 company."""
     for exp in experience_list:
@@ -53,42 +84,75 @@ def has_tier1_experience(experience_list):
     return False, None
 
 
+@lru_cache(maxsize=None)
+def known_country_names():
+    """Lowercase country name or alias -> country name, grouped by word count."""
+    names = {**{country.lower(): country for country in COUNTRY_NAMES}, **COUNTRY_ALIASES}
+    by_length = {}
+    for name, country in names.items():
+        by_length.setdefault(len(name.split()), {})[name] = country
+    return by_length
+
+
+def normalize_country(location):
+    """Country name for a location, from its last comma-separated part.
+
+    Parenthesized notes such as "(remote)" are ignored, and a name or alias
+    from countries.py among the part's words is picked out ("Austin, TX USA"
+    is United States). Otherwise the whole part is the country, title-cased.
+    The result never depends on config.py, so stored Country values stay
+    valid when ELIGIBLE_COUNTRIES changes.
+    """
+    if not location:
+        return ""
+    words = re.sub(r"\([^)]*\)?", " ", location.split(",")[-1]).lower().split()
+    names = known_country_names()
+    # Longest names first, so "united states of america" wins over "united states"
+    for length in sorted(names, reverse=True):
+        for start in range(len(words) - length + 1):
+            country = names[length].get(" ".join(words[start:start + length]))
+            if country:
+                return country
+    return " ".join(words).title()
+
+
+def eligible_countries(countries=ELIGIBLE_COUNTRIES):
+    """Normalized names of the eligible countries."""
+    return {normalize_country(country) for country in countries}
+
+
 def is_eligible_location(location):
     """Check if candidate is in an eligible country."""
     if not location:
         return False, "No location specified"
     
-    location_lower = location.lower()
-    for country in ELIGIBLE_COUNTRIES:
-        if country.lower() in location_lower:
-            return True, country
+    country = normalize_country(location)
+    if country in eligible_countries(ELIGIBLE_COUNTRIES):
+        return True, country
     
     return False, location
 
 
-def evaluate_candidate(applicant_data):
-    """Evaluate if candidate meets shortlisting criteria."""
-    print("applicant ID", applicant_data.get("Applicant ID"))
+def check_criteria(data):
+    """Check parsed applicant data against each shortlisting criterion.
+
+    Returns a dict of criterion name -> passed, and the list of reasons.
+    """
     reasons = []
-    meets_criteria = True
-    
-    # Parse compressed JSON
-    try:
-        data = json.loads(applicant_data.get("Compressed JSON", "{}"))
-    except json.JSONDecodeError:
-        return False, ["Invalid or missing compressed JSON"]
+    passed = {}
     
     # Check experience criteria
     experience = data.get("experience", [])
     total_years = calculate_total_experience(experience)
     has_tier1, tier1_company = has_tier1_experience(experience)
    
+    passed["experience"] = True
     if total_years >= MIN_EXPERIENCE_YEARS:
         reasons.append(f"Has {total_years:.1f} years of experience (>= {MIN_EXPERIENCE_YEARS} required)")
     elif has_tier1:
         reasons.append(f"Worked at Tier-1 company: {tier1_company}")
     else:
-        meets_criteria = False
+        passed["experience"] = False
         reasons.append(f"Does not meet experience criteria: {total_years:.1f} years, no Tier-1 experience")
     
     # Check compensation criteria
@@ -96,10 +160,11 @@ def evaluate_candidate(applicant_data):
     preferred_rate = salary.get("rate", float('inf'))
     availability = salary.get("availability", 0)
     
+    passed["compensation"] = True
     if preferred_rate <= MAX_HOURLY_RATE and availability >= MIN_AVAILABILITY_HOURS:
         reasons.append(f"Compensation fit: ${preferred_rate}/hr <= ${MAX_HOURLY_RATE}/hr, {availability}hrs/wk >= {MIN_AVAILABILITY_HOURS}hrs/wk")
     else:
-        meets_criteria = False
+        passed["compensation"] = False
         if preferred_rate > MAX_HOURLY_RATE:
             reasons.append(f"Rate too high: ${preferred_rate}/hr > ${MAX_HOURLY_RATE}/hr")
         if availability < MIN_AVAILABILITY_HOURS:
@@ -109,40 +174,149 @@ def evaluate_candidate(applicant_data):
     location = data.get("personal", {}).get("location", "")
     is_eligible, location_info = is_eligible_location(location)
     
+    passed["location"] = is_eligible
     if is_eligible:
         reasons.append(f"Located in eligible country: {location_info}")
     else:
-        meets_criteria = False
         reasons.append(f"Not in eligible location: {location_info}")
     
-    return meets_criteria, reasons
+    return passed, reasons
 
 
-def create_shortlist_record(applicant_record, reasons):
-    """Create a record in the Shortlisted Leads table."""
-    shortlist_table = get_table(SHORTLISTED_LEADS_TABLE)
+def evaluate_candidate(applicant_data):
+    """Evaluate if candidate meets shortlisting criteria."""
+    print("applicant ID", applicant_data.get("Applicant ID"))
+    
+    # Parse compressed JSON
+    try:
+        data = json.loads(applicant_data.get("Compressed JSON", "{}"))
+    except json.JSONDecodeError:
+        return False, ["Invalid or missing compressed JSON"]
     
-    fields = {
+    passed, reasons = check_criteria(data)
+    return all(passed.values()), reasons
+
+
+def rule_score(applicant_data):
+    """Return how many of the CRITERIA_COUNT criteria an applicant meets (0 if JSON is invalid)."""
+    try:
+        data = json.loads(applicant_data.get("Compressed JSON", "{}"))
+    except json.JSONDecodeError:
+        return 0
+    
+    passed, _ = check_criteria(data)
+    return sum(passed.values())
+
+
+def derived_fields(data):
+    """Indexable Applicants fields derived from parsed Compressed JSON (see DERIVED_FIELDS).
+
+    Total Experience Years counts current jobs up to today, so for applicants
+    with a current job it falls behind until they are compressed again;
+    prefilter_formula allows for that.
+    """
+    experience = data.get("experience", [])
+    salary = data.get("salary", {})
+    return {
+        "Total Experience Years": round(calculate_total_experience(experience), 2),
+        "Has Current Job": has_current_job(experience),
+        "Has Tier-1 Experience": has_tier1_experience(experience)[0],
+        "Country": normalize_country(data.get("personal", {}).get("location", "")),
+        "Preferred Rate": salary.get("rate"),
+        "Availability (hrs/wk)": salary.get("availability"),
+    }
+
+
+def _formula_string(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def prefilter_formula():
+    """Airtable formula for rows that may meet every criterion, judged on the derived fields.
+
+    It errs towards including rows: experience years of applicants with a
+    current job are topped up by the time since they were written (plus
+    PREFILTER_SLACK_DAYS), blank fields
+    compare as 0, and rows compressed before the derived fields existed are
+    always included. Rows it lets through are still checked against the
+    Compressed JSON. Rows without a current job are not topped up: their years
+    don't change, so compress skips rewriting them and the field's last
+    modified time stops moving.
+    """
+    # DATETIME_DIFF counts whole days and the stored years are rounded to 0.01
+    # (up to ~1.8 days short), so the top-up gets PREFILTER_SLACK_DAYS extra
+    years = ("{Total Experience Years} + IF({Has Current Job}, (DATETIME_DIFF(NOW(), "
+             f"LAST_MODIFIED_TIME({{Total Experience Years}}), 'days') + {PREFILTER_SLACK_DAYS}) / 365.25, 0)")
+    countries = ", ".join(f"{{Country}} = {_formula_string(country)}" for country in sorted(eligible_countries()))
+    meets_criteria = (
+        f"AND(OR({years} >= {MIN_EXPERIENCE_YEARS}, {{Has Tier-1 Experience}}), "
+        f"{{Preferred Rate}} <= {MAX_HOURLY_RATE}, "
+        f"{{Availability (hrs/wk)}} >= {MIN_AVAILABILITY_HOURS}, "
+        f"OR({countries}))"
+    )
+    return f"AND({HAS_COMPRESSED_JSON}, OR({{Country}} = BLANK(), {meets_criteria}))"
+
+
+def newly_failing_formula():
+    """Airtable formula for compressed rows that fail the prefilter and aren't marked so yet."""
+    return (f"AND({HAS_COMPRESSED_JSON}, NOT({prefilter_formula()}), "
+            f"{{Shortlist Status}} != 'Not Shortlisted')")
+
+
+def shortlist_record_fields(applicant_record, reasons):
+    """Build the fields of a Shortlisted Leads record."""
+    return {
         "Applicant": [applicant_record['id']],  # Link to Applicants table
         "Compressed JSON": applicant_record['fields'].get('Compressed JSON', ''),
-        "Score Reason": " | ".join(reasons)
+        "Score Reason": " | ".join(reasons),
+        SHARD_KEY_FIELD: shard_key(applicant_record['fields'].get('Applicant ID', applicant_record['id'])),
     }
-    
-    shortlist_table.create(fields)
+
+
+def create_shortlist_record(applicant_record, reasons):
+    """Create a record in the Shortlisted Leads table."""
+    shortlist_table = get_table(SHORTLISTED_LEADS_TABLE)
+    shortlist_table.create(shortlist_record_fields(applicant_record, reasons))
     print(f"Created shortlist record for {applicant_record['fields'].get('Applicant ID')}")
 
 
-def clear_shortlisted_leads():
-    """Delete all existing records from the Shortlisted Leads table."""
+def clear_shortlisted_leads(applicant_record_ids=None, write_buffer=None, shard=None):
+    """Delete existing records from the Shortlisted Leads table.
+
+    If `applicant_record_ids` is given, only records linked to those applicants
+    are deleted (used by sharded runs, where each worker owns its applicants);
+    `shard` limits the download to that shard's leads. With `write_buffer`, the
+    deletion waits until the buffer flushes the new leads that replace them.
+    """
     shortlist_table = get_table(SHORTLISTED_LEADS_TABLE)
-    all_records = shortlist_table.all()
+    all_records = shortlist_table.all(fields=["Applicant"], formula=shard_formula(shard))
+    if applicant_record_ids is not None:
+        all_records = [
+            record for record in all_records
+            if set(record['fields'].get("Applicant", [])) & applicant_record_ids
+        ]
     
-    if all_records:
-        for record in all_records:
-            shortlist_table.delete(record['id'])
+    if not all_records:
+        print("No existing shortlist records to delete")
+    elif write_buffer is not None:
+        write_buffer.delete_shortlist_records([record['id'] for record in all_records])
+        print(f"Replacing {len(all_records)} existing shortlist records when results are written")
+    else:
+        shortlist_table.batch_delete([record['id'] for record in all_records])
         print(f"Deleted {len(all_records)} existing shortlist records")
+
+
+def remove_shortlist_records(applicant_id, write_buffer=None):
+    """Delete Shortlisted Leads records linked to a single applicant (at flush, with `write_buffer`)."""
+    shortlist_table = get_table(SHORTLISTED_LEADS_TABLE)
+    formula = f"ARRAYJOIN({{Applicant}}) = '{applicant_id}'"
+    records = shortlist_table.all(formula=formula, fields=["Applicant"])
+    if not records:
+        return
+    if write_buffer is not None:
+        write_buffer.delete_shortlist_records([record['id'] for record in records])
     else:
-        print("No existing shortlist records to delete")
+        shortlist_table.batch_delete([record['id'] for record in records])
 
 
 def update_shortlist_status(applicant_record_id, status):
@@ -151,38 +325,96 @@ def update_shortlist_status(applicant_record_id, status):
     applicants_table.update(applicant_record_id, {"Shortlist Status": status})
 
 
-def shortlist_candidates():
-    """Evaluate all candidates and shortlist those who meet criteria."""
-    applicants_table = get_table(APPLICANTS_TABLE)
-    
-    # Clear all existing shortlisted leads first
-    clear_shortlisted_leads()
-    
-    # Get all applicants with compressed JSON
-    applicants = applicants_table.all()
-    
-    shortlisted_count = 0
-    for applicant in applicants:
-        applicant_id = applicant['fields'].get('Applicant ID')
-        
-        # Skip if no compressed JSON
-        if not applicant['fields'].get('Compressed JSON'):
-            print(f"Skipping {applicant_id} - no compressed JSON")
-            continue
-        
-        # Evaluate candidate
-        meets_criteria, reasons = evaluate_candidate(applicant['fields'])
-        
+def shortlist_applicant(applicant, write_buffer=None):
+    """Evaluate one applicant record, update its status and return whether it was shortlisted.
+
+    The status update and shortlist record are staged in `write_buffer` if
+    given, otherwise written immediately.
+    """
+    applicant_id = applicant['fields'].get('Applicant ID')
+    meets_criteria, reasons = evaluate_candidate(applicant['fields'])
+    status = "Shortlisted" if meets_criteria else "Not Shortlisted"
+
+    if meets_criteria:
+        print(f"Shortlisted {applicant_id}: {'; '.join(reasons)}")
+    else:
+        print(f"Not shortlisted {applicant_id}: {'; '.join(reasons)}")
+
+    if write_buffer is None:
         if meets_criteria:
             create_shortlist_record(applicant, reasons)
-            update_shortlist_status(applicant['id'], "Shortlisted")
-            shortlisted_count += 1
-            print(f"Shortlisted {applicant_id}: {'; '.join(reasons)}")
+        update_shortlist_status(applicant['id'], status)
+        return meets_criteria
+
+    if meets_criteria:
+        write_buffer.add_shortlist_record(shortlist_record_fields(applicant, reasons))
+    write_buffer.stage(applicant['id'], {"Shortlist Status": status})
+    applicant['fields']['Shortlist Status'] = status
+
+    return meets_criteria
+
+
+def shortlist_candidates(write_buffer=None, shard=None, snapshot_path=None, output_path=REPLAY_OUTPUT_PATH):
+    """Evaluate all candidates, or only those in `shard` (index, count), and shortlist those who meet criteria.
+
+    Status updates are staged in `write_buffer` when one is given; otherwise
+    they are written at the end of the run. With `snapshot_path`, applicants are
+    streamed from that NDJSON snapshot instead of Airtable and results go to
+    the local file `output_path` (unless `write_buffer` is given).
+
+    Reading from Airtable, only rows passing `prefilter_formula` (and in
+    `shard`) are downloaded and checked in full. Rows that fail it are fetched by ID only and marked Not
+    Shortlisted. If this run has Compressed JSON or derived fields that aren't
+    written yet, Airtable's copy is out of date, so every row is checked instead.
+    """
+    shortlisted_count = 0
+    failing = []
+    with applicant_writes(write_buffer, output_path if snapshot_path else None) as writes:
+        if snapshot_path:
+            from snapshot import iter_snapshot
+
+            # Replay runs stream the snapshot and leave Airtable untouched
+            applicants = select_shard(iter_snapshot(snapshot_path), shard)
         else:
-            update_shortlist_status(applicant['id'], "Not Shortlisted")
-            print(f"Not shortlisted {applicant_id}: {'; '.join(reasons)}")
+            applicants_table = get_table(APPLICANTS_TABLE)
+            if any(writes.has_pending(name) for name in PREFILTER_INPUTS):
+                applicants = writes.track(applicants_table.all(fields=APPLICANT_FIELDS, formula=shard_formula(shard)))
+            else:
+                applicants = writes.track(applicants_table.all(
+                    fields=APPLICANT_FIELDS, formula=shard_formula(shard, prefilter_formula())
+                ))
+                failing = writes.track(applicants_table.all(
+                    fields=["Applicant ID"], formula=shard_formula(shard, newly_failing_formula())
+                ))
+                print(f"Prefiltered in Airtable: {len(applicants)} possible candidates, "
+                      f"{len(failing)} newly failing applicants")
+            
+            # Existing shortlisted leads (only this shard's when sharded) are
+            # replaced when the new ones are written
+            if shard is None:
+                clear_shortlisted_leads(write_buffer=writes)
+            else:
+                applicants = select_shard(applicants, shard)
+                failing = select_shard(failing, shard)
+                clear_shortlisted_leads({applicant['id'] for applicant in applicants + failing}, writes, shard)
+        
+        for applicant in failing:
+            writes.stage(applicant['id'], {"Shortlist Status": "Not Shortlisted"})
+        
+        for applicant in applicants:
+            applicant_id = applicant['fields'].get('Applicant ID')
+            
+            # Skip if no compressed JSON
+            if not applicant['fields'].get('Compressed JSON'):
+                print(f"Skipping {applicant_id} - no compressed JSON")
+                continue
+            
+            # Evaluate candidate
+            if shortlist_applicant(applicant, writes):
+                shortlisted_count += 1
     
     print(f"\nShortlisting completed! {shortlisted_count} candidates shortlisted.")
+    return shortlisted_count
 
 
 if __name__ == "__main__":
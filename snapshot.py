@@ -0,0 +1,91 @@
+"""NDJSON snapshots of applicants for offline, repeatable pipeline runs.
+
+`export_snapshot` streams every applicant with Compressed JSON into a
+(gzip-compressed) NDJSON file, one Airtable-shaped record per line:
+{"id", "createdTime", "fields": {"Applicant ID", "Compressed JSON"}}.
+
+`iter_snapshot` reads it back one record at a time: gzip files are streamed,
+uncompressed files are memory-mapped. Shortlisting and evaluation accept a
+snapshot path in place of Airtable and write their results to a local file,
+so tuning and regression runs never touch the live base.
+"""
+import gzip
+import json
+import mmap
+import time
+from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
+from config import (
+    APPLICANTS_TABLE,
+    SNAPSHOT_PATH, REPLAY_OUTPUT_PATH
+)
+from shortlist_leads import HAS_COMPRESSED_JSON
+
+# Applicants fields a snapshot keeps (only rows with Compressed JSON are kept)
+SNAPSHOT_FIELDS = ["Applicant ID", "Compressed JSON"]
+
+
+def get_table(table_name):
+    """Get Airtable table instance."""
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
+
+
+def export_snapshot(path=SNAPSHOT_PATH):
+    """Stream all applicants with Compressed JSON into an NDJSON snapshot file."""
+    applicants_table = get_table(APPLICANTS_TABLE)
+    started = time.time()
+
+    count = 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as output:
+        for page in applicants_table.iterate(fields=SNAPSHOT_FIELDS, formula=HAS_COMPRESSED_JSON):
+            for record in page:
+                output.write(json.dumps({
+                    "id": record['id'],
+                    "createdTime": record.get('createdTime', ''),
+                    "fields": record['fields']
+                }, separators=(",", ":")) + "\n")
+            count += len(page)
+
+    print(f"Exported {count} applicants to {path} in {time.time() - started:.1f}s")
+    return count
+
+
+def iter_snapshot(path=SNAPSHOT_PATH):
+    """Yield applicant records from a snapshot without loading the whole file."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            for line in snapshot:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, "rb") as snapshot:
+        try:
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # Empty file
+        with mapped:
+            for line in iter(mapped.readline, b""):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def run_replay(path=SNAPSHOT_PATH, output_path=REPLAY_OUTPUT_PATH):
+    """Run shortlisting and LLM evaluation against a snapshot, writing results locally."""
+    from shortlist_leads import shortlist_candidates
+    from llm_evaluation import evaluate_all_applicants
+    from write_buffer import LocalWriteBuffer
+
+    write_buffer = LocalWriteBuffer(output_path)
+    try:
+        shortlist_candidates(write_buffer, snapshot_path=path)
+        evaluate_all_applicants(write_buffer, snapshot_path=path)
+    finally:
+        write_buffer.flush()
+    print(f"Replay results written to {output_path}")
+
+
+if __name__ == "__main__":
+    export_snapshot()
@@ -0,0 +1,95 @@
+"""Tests that criteria sweeps agree with shortlisting."""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import shortlist_leads
+from criteria_sweep import CRITERIA_NAMES, ProfileSet, expand_grid, sweep_criteria
+from sample_data import generate_applicants
+
+
+def applicant_record(applicant):
+    data = {key: applicant[key] for key in ("personal", "experience", "salary")}
+    return {"id": f"rec{applicant['id']}",
+            "fields": {"Applicant ID": applicant["id"], "Compressed JSON": json.dumps(data)}}
+
+
+class SweepMatchesCheckCriteriaTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.records = [applicant_record(applicant) for applicant in generate_applicants(300, seed=7)]
+        cls.records.append({"id": "recBAD", "fields": {"Applicant ID": "BAD", "Compressed JSON": "{"}})
+        cls.profiles = ProfileSet(cls.records)
+
+    def shortlisted_by_check_criteria(self, criteria):
+        patchers = [mock.patch.object(shortlist_leads, name, value) for name, value in criteria.items()]
+        for patcher in patchers:
+            patcher.start()
+        try:
+            shortlisted = []
+            for record in self.records:
+                try:
+                    data = json.loads(record["fields"]["Compressed JSON"])
+                except json.JSONDecodeError:
+                    continue
+                if all(shortlist_leads.check_criteria(data)[0].values()):
+                    shortlisted.append(record["fields"]["Applicant ID"])
+            return shortlisted
+        finally:
+            for patcher in patchers:
+                patcher.stop()
+
+    def assert_sweep_matches(self, grid):
+        configurations = expand_grid(grid)
+        results = sweep_criteria(self.profiles, configurations)
+        counts = set()
+        for overrides, result in zip(configurations, results):
+            criteria = {name: getattr(config, name) for name in CRITERIA_NAMES}
+            criteria.update(overrides)
+            expected = self.shortlisted_by_check_criteria(criteria)
+            with self.subTest(criteria=overrides):
+                self.assertEqual(self.profiles.ids(self.profiles.shortlist_mask(criteria)), expected)
+                self.assertEqual(result["shortlisted"], len(expected))
+            counts.add(len(expected))
+        # The grid must actually separate applicants for the comparison to mean anything
+        self.assertGreater(len(counts), 1)
+
+    def test_thresholds(self):
+        self.assert_sweep_matches({
+            "MIN_EXPERIENCE_YEARS": [0, 2, 4, 8],
+            "MAX_HOURLY_RATE": [50, 100, 300],
+            "MIN_AVAILABILITY_HOURS": [10, 20, 40],
+        })
+
+    def test_tier1_companies(self):
+        self.assert_sweep_matches({
+            "MIN_EXPERIENCE_YEARS": [4, 20],
+            "TIER_1_COMPANIES": [config.TIER_1_COMPANIES, ["Google"], ["amazon web"], []],
+        })
+
+    def test_eligible_countries(self):
+        self.assert_sweep_matches({
+            "ELIGIBLE_COUNTRIES": [
+                config.ELIGIBLE_COUNTRIES,
+                ["United States of America"],
+                ["UK", "Brasil", "Australia"],
+                ["Nigeria", "Philippines", "Poland"],
+                [],
+            ],
+        })
+
+    def test_configuration_list(self):
+        self.assert_sweep_matches([
+            {},
+            {"MIN_EXPERIENCE_YEARS": 1, "TIER_1_COMPANIES": [], "ELIGIBLE_COUNTRIES": ["India"]},
+            {"MAX_HOURLY_RATE": 75, "MIN_AVAILABILITY_HOURS": 30, "TIER_1_COMPANIES": ["Meta", "Apple"]},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Tests for near-duplicate profile matching."""
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import DuplicateIndex, profile_tokens
+
+PROFILE = {
+    "personal": {"name": "Jane Doe", "location": "San Francisco, USA"},
+    "experience": [
+        {"company": "Google", "title": "Senior Software Engineer", "start": "2018-01", "end": "2021-06",
+         "technologies": "Python, Go, Kubernetes"},
+        {"company": "Stripe", "title": "Staff Engineer", "start": "2021-07", "end": "",
+         "technologies": "Ruby, Python, Postgres"},
+        {"company": "Acme Inc", "title": "Software Engineer", "start": "2015-03", "end": "2017-12",
+         "technologies": "Java, Spring"},
+    ],
+    "salary": {"rate": 90, "minimum_rate": 80, "currency": "USD", "availability": 30},
+}
+
+
+def edited(**changes):
+    """PROFILE with `changes` applied as (section, key) -> value."""
+    data = copy.deepcopy(PROFILE)
+    for path, value in changes.items():
+        section, key = path.split("__")
+        data[section][key] = value
+    return data
+
+
+class DuplicateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = DuplicateIndex(0.9)
+        self.index.add("APP-1", profile_tokens(PROFILE), {"score": 8})
+
+    def test_resubmission_under_new_name_matches(self):
+        match = self.index.find(profile_tokens(edited(personal__name="J. Doe")))
+        self.assertEqual(match[0], "APP-1")
+
+    def test_small_experience_edit_matches(self):
+        data = copy.deepcopy(PROFILE)
+        data["experience"][0]["technologies"] += ", Bazel"
+        self.assertEqual(self.index.find(profile_tokens(data))[0], "APP-1")
+
+    def test_salary_or_location_change_does_not_match(self):
+        for changes in ({"salary__rate": 120}, {"salary__availability": 10},
+                        {"salary__currency": "EUR"}, {"personal__location": "San Francisco, Brazil"}):
+            with self.subTest(changes=changes):
+                self.assertIsNone(self.index.find(profile_tokens(edited(**changes))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Tests for the LLM circuit breaker."""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    """Stands in for llm_client.time: sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("llm_client.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, cooldown=10, max_pauses=1)
+
+    def fail_probe(self):
+        self.breaker.before_call()
+        self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+
+        self.breaker.before_call()  # Waits out the cool-down, then probes
+        self.assertEqual(self.clock.slept, [10])
+
+    def test_trips_then_recovers_when_provider_is_healthy(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()  # Pause 1
+        self.fail_probe()  # Pause 2: past max_pauses
+
+        # Given up: callers fail fast during the cool-down instead of waiting
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.assertEqual(self.clock.slept, [10])
+
+        # Once the cool-down expires a probe is let through, and success closes the circuit
+        self.clock.now += 10
+        self.breaker.before_call()
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.before_call()
+        self.assertEqual(self.clock.slept, [10])
+
+    def test_failed_probe_after_giving_up_fails_fast_again(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.fail_probe()
+        self.clock.now += 10
+        self.fail_probe()
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_only_one_probe_while_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.before_call()  # Probe
+        self.breaker.before_call()  # Waits for the probe's cool-down instead of probing too
+        self.assertEqual(self.clock.slept, [10])
+
+
+if __name__ == "__main__":
+    unittest.main()
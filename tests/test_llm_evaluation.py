@@ -0,0 +1,149 @@
+"""Tests for LLM evaluation scheduling and logging."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_evaluation
+
+
+def profile(company, rate):
+    return {
+        "personal": {"name": company, "location": "Berlin, Germany"},
+        "experience": [{"company": company, "title": "Engineer", "start": "2015-01", "end": ""}],
+        "salary": {"rate": rate, "currency": "USD", "availability": 30},
+    }
+
+
+class EvaluateAllApplicantsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.snapshot = os.path.join(self.tmp.name, "snapshot.ndjson")
+        self.output = os.path.join(self.tmp.name, "results.ndjson")
+        self.llm_calls = []
+
+        for name, value in (("LLM_PACK_SIZE", 1), ("LLM_EVALUATION_SCOPE", "all"),
+                            ("LLM_DUPLICATE_THRESHOLD", 0.9)):
+            patcher = mock.patch.object(llm_evaluation, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(llm_evaluation, "evaluate_applicants_with_llm", self.fake_llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_llm(self, applicants_data):
+        self.llm_calls.extend(fields["Applicant ID"] for fields in applicants_data)
+        return [{"score": 7, "summary": "ok", "follow_ups": ""} for _ in applicants_data]
+
+    def write_snapshot(self, profiles):
+        with open(self.snapshot, "w", encoding="utf-8") as snapshot:
+            for index, (applicant_id, data) in enumerate(profiles):
+                snapshot.write(json.dumps({
+                    "id": f"rec{applicant_id}",
+                    # Newest first, so applicants are evaluated in the order given
+                    "createdTime": f"2024-01-{20 - index:02d}T00:00:00.000Z",
+                    "fields": {"Applicant ID": applicant_id, "Compressed JSON": json.dumps(data)},
+                }) + "\n")
+
+    def evaluate(self, budget):
+        return llm_evaluation.evaluate_all_applicants(
+            snapshot_path=self.snapshot, output_path=self.output, budget=budget
+        )
+
+    def test_reused_evaluations_do_not_use_budget(self):
+        self.write_snapshot([
+            ("A", profile("Acme", 80)),
+            ("B", profile("Acme", 80)),  # Same profile as A: reuses its evaluation
+            ("C", profile("Globex", 90)),
+            ("D", profile("Initech", 70)),
+        ])
+
+        self.assertEqual(self.evaluate(budget=2), 3)
+        self.assertEqual(self.llm_calls, ["A", "C"])
+
+    def test_no_budget_evaluates_everyone(self):
+        self.write_snapshot([("A", profile("Acme", 80)), ("C", profile("Globex", 90))])
+
+        self.assertEqual(self.evaluate(budget=None), 2)
+        self.assertEqual(self.llm_calls, ["A", "C"])
+
+    def test_results_are_written_in_chunks(self):
+        self.write_snapshot([(name, profile(name, 80)) for name in ("A", "B", "C", "D")])
+        written = []
+
+        def fake_llm(applicants_data):
+            if os.path.exists(self.output):
+                with open(self.output, encoding="utf-8") as output:
+                    written.append(len(output.readlines()))
+            else:
+                written.append(0)
+            return self.fake_llm(applicants_data)
+
+        with mock.patch.object(llm_evaluation, "LLM_FLUSH_EVERY_RECORDS", 2), \
+                mock.patch.object(llm_evaluation, "evaluate_applicants_with_llm", fake_llm):
+            self.assertEqual(self.evaluate(budget=None), 4)
+
+        self.assertEqual(written, [0, 0, 2, 2])
+        with open(self.output, encoding="utf-8") as output:
+            self.assertEqual(len(output.readlines()), 4)
+
+    def test_reuse_does_not_chain_through_edits(self):
+        # Each profile swaps one technology: neighbours are 91% similar, A0 and A2 only 83%
+        technologies = ["Python", "Go", "Rust", "Java", "Kotlin", "Scala", "Ruby", "Perl", "Elixir",
+                        "Haskell", "OCaml", "Swift", "C", "Lua", "Dart", "Julia", "Zig", "Nim", "R", "PHP"]
+        chain = []
+        for index in range(7):
+            data = profile("Acme", 80)
+            data["experience"][0]["technologies"] = ", ".join(technologies[index:index + 14])
+            chain.append((f"A{index}", data))
+        self.write_snapshot(chain)
+
+        self.assertEqual(self.evaluate(budget=None), 7)
+        self.assertEqual(self.llm_calls, ["A0", "A2", "A4", "A6"])
+
+        with open(self.output, encoding="utf-8") as output:
+            fingerprints = {
+                line["id"]: json.loads(line["fields"]["LLM Fingerprint"])
+                for line in map(json.loads, output)
+            }
+        # Reused evaluations keep the fingerprint of the profile the LLM evaluated
+        self.assertEqual(fingerprints["recA1"]["source"], "A0")
+        self.assertEqual(fingerprints["recA1"]["tokens"], fingerprints["recA0"]["tokens"])
+        self.assertEqual(fingerprints["recA3"]["source"], "A2")
+
+
+class PackLoggingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        for target, value in (("config.LANGSMITH_API_KEY", "key"),
+                              ("llm_evaluation.langsmith_client", lambda: self.client)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_logs_one_run_per_pack(self):
+        evaluation = {"score": 7, "summary": "ok", "follow_ups": "", "strengths": [], "concerns": []}
+        reply = {"evaluations": [{"applicant_id": "A", **evaluation}, {"applicant_id": "B", **evaluation}]}
+        applicants = [
+            {"Applicant ID": applicant_id, "Compressed JSON": json.dumps(profile("Acme", 80))}
+            for applicant_id in ("A", "B")
+        ]
+
+        with mock.patch.object(llm_evaluation, "call_structured", return_value=reply):
+            results = llm_evaluation.evaluate_applicants_with_llm(applicants)
+
+        self.assertEqual(results, [evaluation, evaluation])
+        self.client.create_run.assert_called_once()
+        run = self.client.create_run.call_args.kwargs
+        self.assertEqual(run["inputs"]["applicant_ids"], ["A", "B"])
+        self.assertIn('"applicant_id":"A"', run["inputs"]["prompt"])
+        self.assertEqual(run["outputs"]["evaluations"], {"A": evaluation, "B": evaluation})
+
+
+if __name__ == "__main__":
+    unittest.main()
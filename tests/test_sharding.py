@@ -0,0 +1,57 @@
+"""Tests for shard leases."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import LeaseStore, other_shards_formula, run_worker, shard_budget, shard_formula
+
+
+class WorkerJoinTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "leases.sqlite3")
+        self.store = LeaseStore(self.path)
+
+    def test_worker_refuses_to_start_without_a_run(self):
+        with self.assertRaises(RuntimeError):
+            run_worker("w1", self.path, shard_count=4)
+
+    def test_worker_with_other_shard_count_leaves_run_alone(self):
+        self.store.init_run(4)
+        self.assertEqual(self.store.claim("w0"), (0, 4))
+
+        with self.assertRaises(RuntimeError):
+            run_worker("w1", self.path, shard_count=8)
+
+        progress = self.store.progress()
+        self.assertEqual(len(progress), 4)
+        self.assertEqual(progress[0]["status"], "running")
+
+
+
+class ShardBudgetTest(unittest.TestCase):
+    def test_shares_add_up_to_the_run_budget(self):
+        for budget in (0, 3, 8, 21):
+            with self.subTest(budget=budget):
+                shares = [shard_budget(budget, (index, 8)) for index in range(8)]
+                self.assertEqual(sum(shares), budget)
+                self.assertLessEqual(max(shares) - min(shares), 1)
+        self.assertIsNone(shard_budget(None, (0, 8)))
+
+
+class ShardFormulaTest(unittest.TestCase):
+    def test_formulas(self):
+        self.assertIsNone(shard_formula(None))
+        self.assertEqual(shard_formula(None, "X"), "X")
+        in_shard = "OR({Shard Key} = BLANK(), MOD({Shard Key}, 8) = 3)"
+        self.assertEqual(shard_formula((3, 8)), in_shard)
+        self.assertEqual(shard_formula((3, 8), "X"), f"AND(X, {in_shard})")
+        self.assertEqual(other_shards_formula((3, 8), "X"), f"AND(X, NOT({in_shard}))")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests for shortlisting criteria."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shortlist_leads import derived_fields, eligible_countries, is_eligible_location, normalize_country
+
+
+class NormalizeCountryTest(unittest.TestCase):
+    def test_country_found_among_words_of_last_part(self):
+        cases = {
+            "Austin, TX USA": "United States",
+            "Berlin, Germany (remote)": "Germany",
+            "New York, United States of America": "United States",
+            "Bangalore, India (hybrid)": "India",
+            "London, UK": "United Kingdom",
+            "USA": "United States",
+        }
+        for location, country in cases.items():
+            with self.subTest(location=location):
+                self.assertEqual(normalize_country(location), country)
+                self.assertTrue(is_eligible_location(location)[0])
+
+    def test_other_countries_are_not_eligible(self):
+        for location in ("Moscow, Russia", "Sydney, Australia", "Paris, France (remote)"):
+            with self.subTest(location=location):
+                self.assertFalse(is_eligible_location(location)[0])
+        self.assertEqual(normalize_country("Paris, France (remote)"), "France")
+
+    def test_country_does_not_depend_on_eligible_countries(self):
+        # Compress stores this before Brazil is made eligible; it must still match afterwards
+        self.assertEqual(normalize_country("Rio de Janeiro, RJ Brazil"), "Brazil")
+        self.assertIn("Brazil", eligible_countries(["USA", "Brazil"]))
+
+
+class DerivedFieldsTest(unittest.TestCase):
+    def test_has_current_job(self):
+        past = {"company": "Acme", "start": "2015-01-01", "end": "2019-06-30"}
+        current = {"company": "Globex", "start": "2019-07-01", "end": ""}
+        self.assertTrue(derived_fields({"experience": [past, current]})["Has Current Job"])
+        self.assertFalse(derived_fields({"experience": [past]})["Has Current Job"])
+        undated = {"company": "Initech", "start": "", "end": ""}
+        self.assertFalse(derived_fields({"experience": [undated]})["Has Current Job"])
+
+
+if __name__ == "__main__":
+    unittest.main()
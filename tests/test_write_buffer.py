@@ -0,0 +1,59 @@
+"""Tests for the Applicants write buffer."""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from write_buffer import ApplicantWriteBuffer
+
+
+class FakeTable:
+    """Records the batch calls made against one table."""
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def batch_create(self, records):
+        self.calls.append((self.name, "create", records))
+
+    def batch_delete(self, record_ids):
+        self.calls.append((self.name, "delete", record_ids))
+
+    def batch_update(self, records):
+        self.calls.append((self.name, "update", records))
+
+
+class WriteBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch("write_buffer.get_table", lambda name: FakeTable(name, self.calls))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = ApplicantWriteBuffer()
+
+    def test_replaced_leads_are_deleted_after_new_ones_are_created(self):
+        self.buffer.delete_shortlist_records(["recOldLead"])
+        self.buffer.add_shortlist_record({"Applicant": ["recA"]})
+        self.assertEqual(self.calls, [])
+
+        self.buffer.flush()
+        self.assertEqual(self.calls, [
+            ("Shortlisted Leads", "create", [{"Applicant": ["recA"]}]),
+            ("Shortlisted Leads", "delete", ["recOldLead"]),
+        ])
+
+    def test_zero_is_written_over_a_blank_cell(self):
+        # Airtable omits blank cells, so requested fields missing from the response are None
+        self.buffer.track([{"id": "recA", "fields": {}}],
+                          fields=["Preferred Rate", "Has Tier-1 Experience", "Country"])
+        self.buffer.stage("recA", {"Preferred Rate": 0, "Has Tier-1 Experience": False, "Country": ""})
+
+        self.buffer.flush()
+        self.assertEqual(self.calls, [("Applicants", "update", [{"id": "recA", "fields": {"Preferred Rate": 0}}])])
+
+
+if __name__ == "__main__":
+    unittest.main()
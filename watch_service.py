@@ -0,0 +1,410 @@
+"""Long-running service that pushes changed applicants through the pipeline.
+
+Change notifications come from two sources:
+
+* A local webhook receiver (POST /webhook). The body may name the changed
+  records, e.g. {"recordIds": ["rec..."]} from an Airtable automation, or be
+  an Airtable Webhooks API ping, which triggers an immediate poll.
+* A polling loop that asks Airtable only for child records modified since the
+  previous poll, for when webhooks are not available.
+
+Notifications are coalesced per applicant in a deduplicated work queue; each
+applicant is processed once its edits have settled for WATCH_DEBOUNCE_SECONDS.
+Queue depth and processing lag are served as Prometheus text on GET /metrics.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
+from config import (
+    APPLICANTS_TABLE, PERSONAL_DETAILS_TABLE,
+    WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE,
+    WATCH_HOST, WATCH_PORT, WATCH_POLL_INTERVAL_SECONDS, WATCH_DEBOUNCE_SECONDS,
+    WATCH_EVALUATION_RETRIES, WATCH_RETRY_BACKOFF_SECONDS
+)
+
+# Child tables filled in by the forms; each links back to its applicant
+CHILD_TABLES = [PERSONAL_DETAILS_TABLE, WORK_EXPERIENCE_TABLE, SALARY_PREFERENCES_TABLE]
+POLL_OVERLAP_SECONDS = 5  # Re-scan a few seconds back to tolerate clock skew
+
+
+def get_table(table_name):
+    """Get Airtable table instance."""
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
+
+
+class WorkQueue:
+    """Deduplicated queue of applicant record IDs.
+
+    Repeated notifications for the same record are merged into one entry that
+    remembers when the record first changed (for lag) and when it last changed
+    (for debouncing). Entries scheduled with `retry` only redo the LLM
+    evaluation; a new change to the record turns them back into a full run.
+    """
+
+    def __init__(self, debounce_seconds=WATCH_DEBOUNCE_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self._condition = threading.Condition()
+        self._pending = {}  # record ID -> [first notified, last notified, retry attempt]
+        self.notifications = 0
+        self.coalesced = 0
+
+    def put(self, record_id):
+        """Add a changed record, merging it with any pending entry."""
+        now = time.time()
+        with self._condition:
+            self.notifications += 1
+            if record_id in self._pending:
+                self._pending[record_id][1] = now
+                self._pending[record_id][2] = 0
+                self.coalesced += 1
+            else:
+                self._pending[record_id] = [now, now, 0]
+            self._condition.notify()
+
+    def retry(self, record_id, first_notified, attempt, delay):
+        """Schedule evaluation retry `attempt` for a record in `delay` seconds, keeping its lag."""
+        ready_at = time.time() + delay - self.debounce_seconds
+        with self._condition:
+            if record_id not in self._pending:  # A newer change already queued a full run
+                self._pending[record_id] = [first_notified, ready_at, attempt]
+            self._condition.notify()
+
+    def get(self, timeout=1.0):
+        """Return (record ID, first notified, retry attempt) for the oldest settled entry, or None."""
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                ready = [
+                    (first, record_id)
+                    for record_id, (first, last, _) in self._pending.items()
+                    if now - last >= self.debounce_seconds
+                ]
+                if ready:
+                    first, record_id = min(ready)
+                    _, _, attempt = self._pending.pop(record_id)
+                    return record_id, first, attempt
+
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self._pending:
+                    next_ready = min(last for _, last, _ in self._pending.values()) + self.debounce_seconds
+                    wait = min(wait, max(0.0, next_ready - now))
+                self._condition.wait(wait)
+
+    def depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    def oldest_age(self):
+        """Seconds since the oldest pending change was first notified."""
+        with self._condition:
+            if not self._pending:
+                return 0.0
+            return time.time() - min(first for first, _, _ in self._pending.values())
+
+
+class WatchMetrics:
+    """Counters and lag statistics for the watch service."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.polls = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def record_processed(self, first_notified, ok):
+        lag = time.time() - first_notified
+        with self._lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+
+    def render(self):
+        """Render metrics in the Prometheus text exposition format."""
+        with self._lock:
+            done = self.processed + self.failed
+            values = [
+                ("watch_queue_depth", "gauge", self.queue.depth()),
+                ("watch_queue_oldest_age_seconds", "gauge", self.queue.oldest_age()),
+                ("watch_notifications_total", "counter", self.queue.notifications),
+                ("watch_notifications_coalesced_total", "counter", self.queue.coalesced),
+                ("watch_polls_total", "counter", self.polls),
+                ("watch_processed_total", "counter", self.processed),
+                ("watch_failed_total", "counter", self.failed),
+                ("watch_processing_lag_seconds_last", "gauge", self.last_lag),
+                ("watch_processing_lag_seconds_max", "gauge", self.max_lag),
+                ("watch_processing_lag_seconds_avg", "gauge", self.total_lag / done if done else 0.0),
+            ]
+        lines = []
+        for name, kind, value in values:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class ChangePoller:
+    """Poll Airtable for applicants whose form data changed since the last poll."""
+
+    def __init__(self, queue, metrics, interval=WATCH_POLL_INTERVAL_SECONDS):
+        self.queue = queue
+        self.metrics = metrics
+        self.interval = interval
+        self.watermark = datetime.now(timezone.utc)
+        self._wake = threading.Event()
+
+    def trigger(self):
+        """Poll as soon as possible, e.g. after a webhook ping."""
+        self._wake.set()
+
+    def _since_formula(self, time_function, since):
+        timestamp = since.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return f"IS_AFTER({time_function}, DATETIME_PARSE('{timestamp}'))"
+
+    def poll_once(self):
+        """Queue every applicant created or edited since the watermark."""
+        poll_started = datetime.now(timezone.utc)
+        since = self.watermark - timedelta(seconds=POLL_OVERLAP_SECONDS)
+
+        changed = set()
+        for table_name in CHILD_TABLES:
+            records = get_table(table_name).all(
+                formula=self._since_formula("LAST_MODIFIED_TIME()", since),
+                fields=["Applicant ID"]
+            )
+            for record in records:
+                changed.update(record['fields'].get("Applicant ID", []))
+
+        new_applicants = get_table(APPLICANTS_TABLE).all(
+            formula=self._since_formula("CREATED_TIME()", since),
+            fields=["Applicant ID"]
+        )
+        changed.update(record['id'] for record in new_applicants)
+
+        for record_id in changed:
+            self.queue.put(record_id)
+        self.watermark = poll_started
+        self.metrics.polls += 1
+        if changed:
+            print(f"Poll found {len(changed)} changed applicants")
+
+    def run(self, stop):
+        while not stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Poll failed: {e}")
+            self._wake.wait(self.interval if self.interval else None)
+            self._wake.clear()
+
+
+def get_applicant(record_id, fields):
+    """Fetch one Applicants record with only `fields`, or None if it no longer exists.
+
+    The single-record endpoint always returns every field, so this lists by
+    RECORD_ID() instead.
+    """
+    return get_table(APPLICANTS_TABLE).first(formula=f"RECORD_ID() = '{record_id}'", fields=fields)
+
+
+def process_applicant(record_id):
+    """Run compress -> shortlist -> evaluate for a single applicant record."""
+    # Imported here so the service starts without loading the step modules
+    from compress_json import APPLICANT_FIELDS as COMPRESS_FIELDS, compress_applicant_data, compressed_fields
+    from shortlist_leads import (
+        APPLICANT_FIELDS as SHORTLIST_FIELDS, remove_shortlist_records, shortlist_applicant
+    )
+    from llm_evaluation import EVALUATION_FIELDS
+    from write_buffer import ApplicantWriteBuffer
+
+    # Fields every stage reads or writes, so unchanged (and blank) values aren't re-sent
+    fields = list(dict.fromkeys(COMPRESS_FIELDS + SHORTLIST_FIELDS + EVALUATION_FIELDS))
+    applicant = get_applicant(record_id, fields)
+    applicant_id = applicant['fields'].get('Applicant ID') if applicant else None
+    if not applicant_id:
+        print(f"Skipping missing applicant or applicant without ID: {record_id}")
+        return
+
+    # One PATCH for all three stages' fields
+    write_buffer = ApplicantWriteBuffer()
+    write_buffer.track([applicant], fields)
+
+    compressed_json = compress_applicant_data(applicant_id)
+    write_buffer.stage(record_id, compressed_fields(compressed_json, applicant_id))
+    applicant['fields']['Compressed JSON'] = compressed_json
+
+    remove_shortlist_records(applicant_id, write_buffer)
+    shortlist_applicant(applicant, write_buffer)
+
+    # If evaluation fails, the compress and shortlist updates are still written
+    try:
+        evaluate_applicant(applicant, write_buffer)
+    finally:
+        write_buffer.flush()
+
+
+def evaluate_applicant(applicant, write_buffer):
+    """Evaluate one applicant record if it passes the batch rule gate.
+
+    There is no per-run budget for single applicants. A resubmission whose
+    profile barely changed keeps its stored evaluation.
+    """
+    from llm_evaluation import build_duplicate_index, evaluate_with_reuse, schedule_evaluations
+
+    if schedule_evaluations([applicant]):
+        evaluate_with_reuse(applicant, build_duplicate_index([applicant]), write_buffer)
+
+
+def retry_evaluation(record_id):
+    """Redo only the LLM evaluation of an applicant whose compress and shortlist already ran."""
+    from llm_evaluation import APPLICANT_FIELDS, EVALUATION_FIELDS
+    from write_buffer import ApplicantWriteBuffer
+
+    fields = APPLICANT_FIELDS + EVALUATION_FIELDS
+    applicant = get_applicant(record_id, fields)
+    if applicant is None:
+        print(f"Skipping missing applicant: {record_id}")
+        return
+    write_buffer = ApplicantWriteBuffer()
+    write_buffer.track([applicant], fields)
+    try:
+        evaluate_applicant(applicant, write_buffer)
+    finally:
+        write_buffer.flush()
+
+
+def run_worker(queue, metrics, stop):
+    """Process settled applicants from the queue until stopped.
+
+    An applicant whose LLM evaluation failed transiently is retried, evaluation
+    only, up to WATCH_EVALUATION_RETRIES times with doubling delays; it counts
+    as processed (or failed) once it stops being retried.
+    """
+    while not stop.is_set():
+        item = queue.get(timeout=1.0)
+        if item is None:
+            continue
+
+        record_id, first_notified, attempt = item
+        ok = True
+        try:
+            if attempt:
+                retry_evaluation(record_id)
+            else:
+                process_applicant(record_id)
+        except Exception as e:
+            print(f"Failed to process applicant {record_id}: {e}")
+            if getattr(e, "transient", False) and attempt < WATCH_EVALUATION_RETRIES:
+                delay = WATCH_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                print(f"Retrying evaluation of {record_id} in {delay}s "
+                      f"(retry {attempt + 1}/{WATCH_EVALUATION_RETRIES})")
+                queue.retry(record_id, first_notified, attempt + 1, delay)
+                continue
+            ok = False
+        metrics.record_processed(first_notified, ok)
+        print(f"Processed {record_id} in {time.time() - first_notified:.1f}s "
+              f"(queue depth {queue.depth()})")
+
+
+def record_ids_from_payload(payload):
+    """Extract applicant record IDs from a webhook body, if it names any."""
+    if isinstance(payload, dict):
+        if payload.get("recordId"):
+            return [payload["recordId"]]
+        return list(payload.get("recordIds", []))
+    if isinstance(payload, list):
+        return [record_id for record_id in payload if isinstance(record_id, str)]
+    return []
+
+
+def make_handler(queue, metrics, poller):
+    """Build the HTTP handler class serving /webhook and /metrics."""
+
+    class WatchHandler(BaseHTTPRequestHandler):
+        def _respond(self, status, body, content_type="application/json"):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._respond(200, metrics.render(), "text/plain; version=0.0.4")
+            elif self.path == "/healthz":
+                self._respond(200, '{"status": "ok"}')
+            else:
+                self._respond(404, '{"error": "not found"}')
+
+        def do_POST(self):
+            if self.path != "/webhook":
+                self._respond(404, '{"error": "not found"}')
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._respond(400, '{"error": "invalid JSON"}')
+                return
+
+            record_ids = record_ids_from_payload(payload)
+            for record_id in record_ids:
+                queue.put(record_id)
+            if not record_ids:
+                # Airtable webhook pings carry no record IDs; go and look
+                poller.trigger()
+            self._respond(202, json.dumps({"queued": len(record_ids)}))
+
+        def log_message(self, format, *args):
+            pass  # Keep the console for pipeline output
+
+    return WatchHandler
+
+
+def run_watch_service(host=WATCH_HOST, port=WATCH_PORT,
+                      poll_interval=WATCH_POLL_INTERVAL_SECONDS,
+                      debounce_seconds=WATCH_DEBOUNCE_SECONDS):
+    """Run the webhook receiver, poller and worker until interrupted."""
+    queue = WorkQueue(debounce_seconds)
+    metrics = WatchMetrics(queue)
+    poller = ChangePoller(queue, metrics, poll_interval)
+    stop = threading.Event()
+
+    server = ThreadingHTTPServer((host, port), make_handler(queue, metrics, poller))
+    # Without a poll interval the poller only runs when a webhook ping arrives
+    for target, args in [(server.serve_forever, ()), (run_worker, (queue, metrics, stop)),
+                         (poller.run, (stop,))]:
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    polling = f"polling every {poll_interval}s" if poll_interval else "polling on webhook pings only"
+    print(f"Watching for applicant changes on http://{host}:{port}/webhook ({polling})")
+    print(f"Metrics at http://{host}:{port}/metrics")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nStopping watch service...")
+    finally:
+        stop.set()
+        poller.trigger()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    run_watch_service()
@@ -0,0 +1,172 @@
+"""Unit of work for Applicants-table updates across pipeline stages.
+
+Compress, shortlist and evaluate each update different fields of the same
+applicant row. Instead of one PATCH per stage per record, stages stage their
+updates here; the buffer merges them per record ID and sends one PATCH per
+record, 10 records per request, when the run flushes it. Values equal to what
+was fetched from Airtable are not written at all. New Shortlisted Leads
+records are collected the same way and created in batches; the leads they
+replace are deleted in the same flush, right after, so the table is never
+left empty while later stages run.
+
+LocalWriteBuffer writes the same results to a local NDJSON file instead, for
+offline replay runs.
+"""
+import json
+from contextlib import contextmanager
+from pyairtable import Table
+from rate_limit import rate_limit_table
+import config
+from config import APPLICANTS_TABLE, SHORTLISTED_LEADS_TABLE
+
+
+def get_table(table_name):
+    """Get Airtable table instance."""
+    return rate_limit_table(Table(config.AIRTABLE_API_KEY, config.AIRTABLE_BASE_ID, table_name))
+
+
+def is_blank(value):
+    """Whether Airtable stores `value` as an empty cell (and omits it from responses).
+
+    None, False, "" and [] are blank; 0 and 0.0 are real numbers.
+    """
+    return value is None or value is False or (isinstance(value, (str, list)) and not value)
+
+
+class ApplicantWriteBuffer:
+    """Collects pending field updates per record ID and writes them in batches."""
+
+    def __init__(self, table_name=APPLICANTS_TABLE):
+        self.table_name = table_name
+        self._fetched = {}  # record ID -> field values as stored in Airtable
+        self._pending = {}  # record ID -> field values still to be written
+        self._shortlist_records = []  # Shortlisted Leads records still to be created
+        self._shortlist_deletions = []  # Shortlisted Leads record IDs to delete once they're replaced
+        self.skipped_fields = 0
+
+    def track(self, records, fields=None):
+        """Remember fetched values and overlay pending updates onto `records`.
+
+        Later stages see the values earlier stages staged (e.g. the new
+        Compressed JSON) even though nothing has been written yet. `fields` are
+        the names that were requested; Airtable leaves blank ones out of the
+        response, so those are remembered as blank.
+        """
+        for record in records:
+            fetched = self._fetched.setdefault(record['id'], {})
+            for name in fields or ():
+                fetched.setdefault(name, None)
+            fetched.update(record['fields'])
+            pending = self._pending.get(record['id'])
+            if pending:
+                record['fields'].update(pending)
+        return records
+
+    def stage(self, record_id, fields):
+        """Queue field updates for a record, dropping values that are unchanged."""
+        fetched = self._fetched.get(record_id, {})
+        pending = self._pending.setdefault(record_id, {})
+        for name, value in fields.items():
+            if name in fetched and (fetched[name] == value or (fetched[name] is None and is_blank(value))):
+                pending.pop(name, None)
+                self.skipped_fields += 1
+            else:
+                pending[name] = value
+        if not pending:
+            del self._pending[record_id]
+
+    def add_shortlist_record(self, fields):
+        """Queue a new Shortlisted Leads record."""
+        self._shortlist_records.append(fields)
+
+    def delete_shortlist_records(self, record_ids):
+        """Queue existing Shortlisted Leads records for deletion after the new ones are created."""
+        self._shortlist_deletions.extend(record_ids)
+
+    def has_pending(self, field_name=None):
+        """Whether any update (optionally to `field_name`) is waiting to be written."""
+        if field_name is None:
+            return bool(self._pending)
+        return any(field_name in fields for fields in self._pending.values())
+
+    def pending_count(self):
+        """Number of applicant records with updates waiting to be written."""
+        return len(self._pending)
+
+    def _take_pending(self):
+        """Return and clear pending updates, shortlist records and shortlist deletions."""
+        updates = [
+            {"id": record_id, "fields": fields}
+            for record_id, fields in self._pending.items()
+        ]
+        for update in updates:
+            self._fetched.setdefault(update["id"], {}).update(update["fields"])
+        shortlist_records = self._shortlist_records
+        shortlist_deletions = self._shortlist_deletions
+        self._pending = {}
+        self._shortlist_records = []
+        self._shortlist_deletions = []
+        return updates, shortlist_records, shortlist_deletions
+
+    def _write(self, updates, shortlist_records, shortlist_deletions):
+        # Create before deleting, so a failed flush leaves the old leads in place
+        if shortlist_records:
+            get_table(SHORTLISTED_LEADS_TABLE).batch_create(shortlist_records)
+        if shortlist_deletions:
+            get_table(SHORTLISTED_LEADS_TABLE).batch_delete(shortlist_deletions)
+        if updates:
+            get_table(self.table_name).batch_update(updates)
+
+    def flush(self):
+        """Write all pending changes and return the number of applicant records updated."""
+        updates, shortlist_records, shortlist_deletions = self._take_pending()
+        self._write(updates, shortlist_records, shortlist_deletions)
+
+        print(f"Wrote {len(updates)} applicant records and {len(shortlist_records)} shortlist "
+              f"records, deleted {len(shortlist_deletions)} replaced shortlist records "
+              f"({self.skipped_fields} unchanged field values skipped)")
+        return len(updates)
+
+
+class LocalWriteBuffer(ApplicantWriteBuffer):
+    """Write buffer that writes results to a local NDJSON file instead of Airtable.
+
+    Each line is {"table", "id", "fields"}, matching the local mirror format of
+    sample_data.py; Shortlisted Leads lines have no "id". The file is replaced
+    on the first flush and appended to afterwards. Shortlist deletions are
+    dropped; the local file has no earlier leads to replace.
+    """
+
+    def __init__(self, path, table_name=APPLICANTS_TABLE):
+        super().__init__(table_name)
+        self.path = path
+        self._mode = "w"
+
+    def _write(self, updates, shortlist_records, shortlist_deletions):
+        lines = [
+            {"table": self.table_name, "id": update["id"], "fields": update["fields"]}
+            for update in updates
+        ]
+        lines += [{"table": SHORTLISTED_LEADS_TABLE, "fields": fields} for fields in shortlist_records]
+
+        with open(self.path, self._mode, encoding="utf-8") as output:
+            for line in lines:
+                output.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self._mode = "a"
+
+
+@contextmanager
+def applicant_writes(write_buffer=None, output_path=None):
+    """Yield `write_buffer`, or a fresh buffer that is flushed when the block exits.
+
+    The fresh buffer writes to the local file `output_path` if given, otherwise to Airtable.
+    """
+    if write_buffer is not None:
+        yield write_buffer
+        return
+
+    write_buffer = LocalWriteBuffer(output_path) if output_path else ApplicantWriteBuffer()
+    try:
+        yield write_buffer
+    finally:
+        write_buffer.flush()